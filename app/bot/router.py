@@ -3,7 +3,6 @@ from __future__ import annotations
 import logging
 import re
 from datetime import datetime, timezone
-from zoneinfo import ZoneInfo
 
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -23,7 +22,6 @@ from app.db.repositories.recommendations import (
     create_recommendation,
     add_recommendation_item,
     set_item_status,
-    upsert_feedback,
 )
 from app.db.repositories.pending import set_pending, get_pending, clear_pending
 from app.db.repositories.rate_limit import check_and_touch
@@ -32,6 +30,7 @@ from app.db.repositories.taste_profile import set_avoids_json
 from app.integrations.tmdb import (
     search_movie,
     get_movie_details,
+    get_movie_details_cached,
     get_movie_keywords,
     TMDBError,
 )
@@ -44,13 +43,6 @@ router = Router()
 # Helpers
 # -----------------------------
 
-def today_in_tz(tz_name: str) -> datetime.date:
-    try:
-        return datetime.now(ZoneInfo(tz_name)).date()
-    except Exception:
-        return datetime.utcnow().date()
-
-
 def label_for_strategy(strategy: str) -> str:
     return {
         "safe": "🎯 Попадание",
@@ -135,7 +127,7 @@ async def cb_pick_movie(callback: CallbackQuery) -> None:
     async with AsyncSessionLocal() as session:
         user = await get_or_create_user(session, telegram_id=callback.from_user.id)
         await set_pending(session, user.id, "awaiting_review", {"mode": "manual", "tmdb_id": tmdb_id})
-        details = await get_movie_details(session, tmdb_id)
+        details = await get_movie_details_cached(session, tmdb_id)
 
     if callback.message:
         await callback.message.answer(
@@ -430,7 +422,8 @@ async def cb_watched(callback: CallbackQuery) -> None:
     async with AsyncSessionLocal() as session:
         user = await get_or_create_user(session, telegram_id=callback.from_user.id)
         await set_pending(session, user.id, "awaiting_review", {"mode": "agent", "tmdb_id": tmdb_id, "item_id": item_id})
-        details = await get_movie_details(session, tmdb_id)
+        # кеш процесса: при сохранении отзыва save_review возьмёт details отсюда, без БД/TMDB
+        details = await get_movie_details_cached(session, tmdb_id)
 
     if callback.message:
         await callback.message.answer(
@@ -485,7 +478,7 @@ async def handle_text(message: Message) -> None:
             if len(candidates) == 1:
                 tmdb_id = candidates[0].tmdb_id
                 await set_pending(session, user.id, "awaiting_review", {"mode": "manual", "tmdb_id": tmdb_id})
-                details = await get_movie_details(session, tmdb_id)
+                details = await get_movie_details_cached(session, tmdb_id)
                 await message.answer(
                     f"Ок: {details.title} ({details.year}).\n\n"
                     "Теперь оцени 0–5 и напиши мысли (можно длинно).\n"
@@ -499,7 +492,7 @@ async def handle_text(message: Message) -> None:
                 if exact is not None:
                     tmdb_id = exact.tmdb_id
                     await set_pending(session, user.id, "awaiting_review", {"mode": "manual", "tmdb_id": tmdb_id})
-                    details = await get_movie_details(session, tmdb_id)
+                    details = await get_movie_details_cached(session, tmdb_id)
                     await message.answer(
                         f"Ок: {details.title} ({details.year}).\n\n"
                         "Теперь оцени 0–5 и напиши мысли (можно длинно).\n"
@@ -583,59 +576,31 @@ async def _save_review(
     item_id: int | None,
 ) -> None:
     """
-    Сохраняем:
-    - если mode=agent: feedback + status watched + watched_films(source=agent)
-    - если mode=manual: watched_films(source=manual)
-    Далее:
-    - пересчёт taste_profile v0
-    - (опционально) refresh summary_text через LLM
-    - enqueue jobs на эмбеддинги (review / film_meta / profile)
+    Записи (feedback/status, watched_films) и пересчёт taste_profile — в review_service.save_review;
+    профиль (summary через LLM, эмбеддинг профиля) пересчитывается в фоне со своей сессией.
+    Здесь остаются jobs на эмбеддинги отзыва и film_meta.
     """
-    from app.recommender.taste_profile_v0 import update_taste_profile_v0
-    from app.db.repositories.taste_profile import get_taste_profile
     from app.db.repositories.embeddings import enqueue_embedding_job
     from app.recommender.embedding_texts import build_review_text, build_film_meta_text
-    from app.db.repositories.watched import upsert_watched
+    from app.services.review_service import save_review
     from app.core.config import settings
 
     user = await get_or_create_user(session, telegram_id=telegram_id)
-    watched_date = today_in_tz(user.timezone)
 
-    details = await get_movie_details(session, tmdb_id)
-
-    # feedback + status
-    if mode == "agent" and item_id is not None:
-        await upsert_feedback(
-            session,
-            recommendation_item_id=int(item_id),
-            rating=rating,
-            review=review_text,
-        )
-        await set_item_status(session, int(item_id), "watched")
-        source = "agent"
-    else:
-        source = "manual"
-
-    watched_id = await upsert_watched(
-        session=session,
+    watched_id = await save_review(
+        session,
         user_id=user.id,
+        user_timezone=user.timezone,
         tmdb_id=tmdb_id,
-        title=details.title,
-        year=details.year,
         rating=rating,
-        review=review_text,
-        watched_date=watched_date,
-        source=source,
+        review_text=review_text,
+        mode=mode,
+        recommendation_item_id=int(item_id) if item_id is not None else None,
+        session_factory=AsyncSessionLocal,
     )
 
-    await update_taste_profile_v0(session=session, user_id=user.id)
-
-    # раз в N отзывов красиво переписать summary (если модуль есть)
-    try:
-        from app.llm.summary_refresh import maybe_refresh_summary_text
-        await maybe_refresh_summary_text(session=session, user_id=user.id, every_n=10)
-    except Exception:
-        pass
+    # save_review уже положил details в кеш процесса — повторно в БД/TMDB не ходим
+    details = await get_movie_details_cached(session, tmdb_id)
 
     # enqueue embeddings
     review_embed_text = await build_review_text(
@@ -667,18 +632,6 @@ async def _save_review(
             dimensions=settings.openai_embed_dimensions,
         )
 
-    profile = await get_taste_profile(session, user.id)
-    if profile and profile.summary_text and profile.summary_text.strip():
-        await enqueue_embedding_job(
-            session=session,
-            user_id=user.id,
-            source_type="profile",
-            source_id=int(user.id),
-            content_text=profile.summary_text.strip(),
-            model=settings.openai_embed_model,
-            dimensions=settings.openai_embed_dimensions,
-        )
-
 
 # -----------------------------
 # /avoid
@@ -43,7 +43,26 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def _run_migrations_on(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        compare_type=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
+    # Вызывающий (тесты) может передать своё соединение: тогда все миграции идут
+    # на нём в его транзакции, без отдельного engine и лишних коммитов
+    shared = config.attributes.get("connection")
+    if shared is not None:
+        shared.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+        _run_migrations_on(shared)
+        return
+
     configuration = config.get_section(config.config_ini_section) or {}
     configuration["sqlalchemy.url"] = get_sync_database_url()
 
@@ -59,14 +78,7 @@ def run_migrations_online() -> None:
         connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
         connection.commit()
 
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
-            compare_type=True,
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        _run_migrations_on(connection)
 
 
 if context.is_offline_mode():
@@ -1,12 +1,53 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.db.models import AgentRecommendation, AgentRecommendationItem, Feedback
 
 
+# Выражения собираются один раз при импорте, на вызове подставляются только параметры:
+# SQLAlchemy берёт компиляцию из кеша, asyncpg переиспользует prepared statement.
+# synchronize_session=False — evaluate/fetch не умеют работать с bindparam в WHERE,
+# загруженный в сессию item синхронизируем сами (_sync_item_status).
+def _upsert_feedback_stmt():
+    stmt = insert(Feedback).values(
+        recommendation_item_id=bindparam("item_id"),
+        your_rating=bindparam("rating"),
+        your_review=bindparam("review"),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[Feedback.recommendation_item_id],
+        set_={"your_rating": stmt.excluded.your_rating, "your_review": stmt.excluded.your_review},
+    )
+
+
+_UPSERT_FEEDBACK_STMT = _upsert_feedback_stmt()
+
+_SET_ITEM_STATUS_STMT = (
+    update(AgentRecommendationItem)
+    .where(AgentRecommendationItem.id == bindparam("item_id"))
+    .values(status=bindparam("status"))
+    .execution_options(synchronize_session=False)
+)
+
+_UPSERT_FEEDBACK_AND_MARK_WATCHED_STMT = (
+    update(AgentRecommendationItem)
+    .where(AgentRecommendationItem.id == bindparam("item_id"))
+    .values(status="watched")
+    .add_cte(_upsert_feedback_stmt().returning(Feedback.id).cte("fb"))
+    .execution_options(synchronize_session=False)
+)
+
+
+def _sync_item_status(session: AsyncSession, item_id: int, status: str) -> None:
+    item = session.identity_map.get(session.identity_key(AgentRecommendationItem, item_id))
+    if item is not None:
+        set_committed_value(item, "status", status)
+
+
 async def create_recommendation(session: AsyncSession, user_id: int, context: dict) -> AgentRecommendation:
     rec = AgentRecommendation(user_id=user_id, context_json=context)
     session.add(rec)
@@ -71,22 +112,32 @@ async def add_recommendation_item(
 
 
 async def set_item_status(session: AsyncSession, item_id: int, status: str) -> None:
-    item = (await session.execute(select(AgentRecommendationItem).where(AgentRecommendationItem.id == item_id))).scalar_one_or_none()
-    if item is None:
-        return
-    item.status = status
+    await session.execute(_SET_ITEM_STATUS_STMT, {"item_id": item_id, "status": status})
     await session.commit()
+    _sync_item_status(session, item_id, status)
 
 
 async def upsert_feedback(session: AsyncSession, recommendation_item_id: int, rating: float | None, review: str | None) -> None:
-    stmt = insert(Feedback).values(
-        recommendation_item_id=recommendation_item_id,
-        your_rating=rating,
-        your_review=review,
+    await session.execute(
+        _UPSERT_FEEDBACK_STMT,
+        {"item_id": recommendation_item_id, "rating": rating, "review": review},
     )
-    stmt = stmt.on_conflict_do_update(
-        index_elements=[Feedback.recommendation_item_id],
-        set_={"your_rating": rating, "your_review": review},
+    await session.commit()
+
+
+async def upsert_feedback_and_mark_watched(
+    session: AsyncSession,
+    recommendation_item_id: int,
+    rating: float | None,
+    review: str | None,
+) -> None:
+    """
+    upsert_feedback + set_item_status(..., "watched") одним запросом:
+    INSERT ... ON CONFLICT в CTE и UPDATE статуса в основном выражении.
+    """
+    await session.execute(
+        _UPSERT_FEEDBACK_AND_MARK_WATCHED_STMT,
+        {"item_id": recommendation_item_id, "rating": rating, "review": review},
     )
-    await session.execute(stmt)
     await session.commit()
+    _sync_item_status(session, recommendation_item_id, "watched")
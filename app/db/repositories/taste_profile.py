@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import TasteProfile
@@ -19,28 +20,32 @@ async def upsert_taste_profile(
     weights_json: dict,
     avoids_json: dict | None = None,
 ) -> None:
-    profile = await get_taste_profile(session, user_id)
+    """
+    Один INSERT ... ON CONFLICT (user_id) DO UPDATE вместо SELECT + INSERT/UPDATE.
+    avoids_json=None при обновлении оставляет текущее значение.
+    """
     now = datetime.now(timezone.utc)
-
-    if profile is None:
-        profile = TasteProfile(
-            user_id=user_id,
-            summary_text=summary_text,
-            weights_json=weights_json,
-            avoids_json=avoids_json or {},
-            updated_at=now,
-        )
-        session.add(profile)
-        await session.commit()
-        return
-
-    profile.summary_text = summary_text
-    profile.weights_json = weights_json
+    stmt = pg_insert(TasteProfile).values(
+        user_id=user_id,
+        summary_text=summary_text,
+        weights_json=weights_json,
+        avoids_json=avoids_json or {},
+        updated_at=now,
+    )
+    set_ = {
+        "summary_text": stmt.excluded.summary_text,
+        "weights_json": stmt.excluded.weights_json,
+        "updated_at": stmt.excluded.updated_at,
+    }
     if avoids_json is not None:
-        profile.avoids_json = avoids_json
-    profile.updated_at = now
+        set_["avoids_json"] = stmt.excluded.avoids_json
+    stmt = stmt.on_conflict_do_update(index_elements=[TasteProfile.user_id], set_=set_).returning(TasteProfile)
+
+    # populate_existing: уже загруженный в сессию профиль не останется устаревшим
+    await session.execute(stmt, execution_options={"populate_existing": True})
     await session.commit()
 
+
 async def set_avoids_json(session: AsyncSession, user_id: int, avoids_json: dict) -> None:
     profile = await get_taste_profile(session, user_id)
     if profile is None:
@@ -51,9 +51,11 @@ async def upsert_watched(
             source=source,
         )
         session.add(wf)
+        # id приходит из INSERT ... RETURNING при flush — отдельный refresh-SELECT не нужен
+        await session.flush()
+        watched_id = int(wf.id)
         await session.commit()
-        await session.refresh(wf)
-        return int(wf.id)
+        return watched_id
 
     existing.title = title or existing.title
     existing.year = year if year is not None else existing.year
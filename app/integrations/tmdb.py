@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 
 import httpx
 from sqlalchemy import select
@@ -15,6 +20,14 @@ from app.db.models import TmdbMovieDetailsCache, TmdbMovieKeywordsCache
 
 CACHE_TTL_DAYS = 30
 
+# similar/recommendations кешируем в памяти процесса (в БД их не храним)
+LIST_CACHE_TTL_SECONDS = 6 * 3600
+LIST_CACHE_MAXSIZE = 2048
+
+# MovieDetails для горячих путей (save_review) — поверх кеша в БД, без round-trip
+DETAILS_MEM_CACHE_TTL_SECONDS = 24 * 3600
+DETAILS_MEM_CACHE_MAXSIZE = 4096
+
 
 class TMDBError(RuntimeError):
     """Ошибки TMDB интеграции (сеть, невалидный ответ, 401 и т.д.)."""
@@ -65,10 +78,63 @@ class MovieDetails:
     overview: str | None
 
 
+_shared_client: ContextVar[Optional[httpx.AsyncClient]] = ContextVar("tmdb_shared_client", default=None)
+
+_list_cache: OrderedDict[tuple[str, int, int], tuple[float, list[MovieCandidate]]] = OrderedDict()
+_details_mem_cache: OrderedDict[int, tuple[float, MovieDetails]] = OrderedDict()
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(10.0, connect=10.0)
+
+
+@asynccontextmanager
+async def shared_http_client() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Один httpx.AsyncClient (и пул соединений) на все TMDB-вызовы внутри блока,
+    включая задачи, созданные внутри него. Без блока каждый вызов открывает свой клиент.
+    """
+    async with httpx.AsyncClient(base_url=settings.tmdb_base_url, timeout=_http_timeout()) as client:
+        token = _shared_client.set(client)
+        try:
+            yield client
+        finally:
+            _shared_client.reset(token)
+
+
+def _ttl_get(cache: OrderedDict, key: Any) -> Any:
+    hit = cache.get(key)
+    if hit is None:
+        return None
+    expires, value = hit
+    if expires <= time.monotonic():
+        cache.pop(key, None)
+        return None
+    cache.move_to_end(key)
+    return value
+
+
+def _ttl_put(cache: OrderedDict, key: Any, value: Any, ttl_seconds: float, maxsize: int) -> None:
+    cache[key] = (time.monotonic() + ttl_seconds, value)
+    cache.move_to_end(key)
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+def _list_cache_get(key: tuple[str, int, int]) -> Optional[list[MovieCandidate]]:
+    value = _ttl_get(_list_cache, key)
+    return list(value) if value is not None else None
+
+
+def _list_cache_put(key: tuple[str, int, int], value: list[MovieCandidate]) -> None:
+    _ttl_put(_list_cache, key, list(value), LIST_CACHE_TTL_SECONDS, LIST_CACHE_MAXSIZE)
+
+
 async def _tmdb_get(path: str, params: Optional[dict[str, Any]] = None) -> dict[str, Any]:
     """
     Низкоуровневый GET к TMDB.
     Использует v3 API key (query param api_key).
+    Внутри shared_http_client() переиспользует общий клиент.
     """
     if not settings.tmdb_api_key or settings.tmdb_api_key == "PUT_YOUR_TMDB_KEY_HERE":
         raise TMDBError("TMDB_API_KEY is not set. Put it into .env")
@@ -77,12 +143,15 @@ async def _tmdb_get(path: str, params: Optional[dict[str, Any]] = None) -> dict[
     final_params["api_key"] = settings.tmdb_api_key
     final_params.setdefault("language", settings.tmdb_language)
 
-    timeout = httpx.Timeout(10.0, connect=10.0)
-    async with httpx.AsyncClient(base_url=settings.tmdb_base_url, timeout=timeout) as client:
-        try:
+    try:
+        client = _shared_client.get()
+        if client is not None:
             resp = await client.get(path, params=final_params)
-        except httpx.HTTPError as e:
-            raise TMDBError(f"TMDB network error: {e!r}") from e
+        else:
+            async with httpx.AsyncClient(base_url=settings.tmdb_base_url, timeout=_http_timeout()) as client:
+                resp = await client.get(path, params=final_params)
+    except httpx.HTTPError as e:
+        raise TMDBError(f"TMDB network error: {e!r}") from e
 
     if resp.status_code == 401:
         raise TMDBError("TMDB 401 Unauthorized: check TMDB_API_KEY")
@@ -102,6 +171,44 @@ async def _tmdb_get(path: str, params: Optional[dict[str, Any]] = None) -> dict[
     return data
 
 
+def movie_details_from_payload(tmdb_id: int, data: dict[str, Any]) -> MovieDetails:
+    """
+    Разбор payload /movie/{id} в MovieDetails.
+    """
+    title = data.get("title") or data.get("original_title") or ""
+    year = _extract_year(data.get("release_date"))
+    runtime = _safe_int(data.get("runtime"))
+    overview = data.get("overview")
+    genres_raw = data.get("genres", [])
+    genres: list[str] = []
+    if isinstance(genres_raw, list):
+        for g in genres_raw:
+            if isinstance(g, dict) and g.get("name"):
+                genres.append(str(g["name"]))
+
+    return MovieDetails(
+        tmdb_id=tmdb_id,
+        title=str(title),
+        year=year,
+        runtime=runtime,
+        genres=genres,
+        overview=str(overview) if overview is not None else None,
+    )
+
+
+def keywords_from_payload(data: dict[str, Any]) -> list[str]:
+    """
+    Разбор payload /movie/{id}/keywords в список строк.
+    """
+    keywords_raw = data.get("keywords", [])
+    keywords: list[str] = []
+    if isinstance(keywords_raw, list):
+        for k in keywords_raw:
+            if isinstance(k, dict) and k.get("name"):
+                keywords.append(str(k["name"]))
+    return keywords
+
+
 # -------------------------
 # Public functions
 # -------------------------
@@ -175,25 +282,54 @@ async def get_movie_details(session: AsyncSession, tmdb_id: int) -> MovieDetails
     else:
         data = cached
 
-    title = data.get("title") or data.get("original_title") or ""
-    year = _extract_year(data.get("release_date"))
-    runtime = _safe_int(data.get("runtime"))
-    overview = data.get("overview")
-    genres_raw = data.get("genres", [])
-    genres: list[str] = []
-    if isinstance(genres_raw, list):
-        for g in genres_raw:
-            if isinstance(g, dict) and g.get("name"):
-                genres.append(str(g["name"]))
+    return movie_details_from_payload(tmdb_id, data)
 
-    return MovieDetails(
-        tmdb_id=tmdb_id,
-        title=str(title),
-        year=year,
-        runtime=runtime,
-        genres=genres,
-        overview=str(overview) if overview is not None else None,
-    )
+
+async def get_movie_details_cached(session: AsyncSession, tmdb_id: int) -> MovieDetails:
+    """
+    get_movie_details с кешем в памяти процесса (DETAILS_MEM_CACHE_TTL_SECONDS):
+    повторные сохранения популярных фильмов не ходят ни в БД, ни в TMDB.
+    """
+    details = _ttl_get(_details_mem_cache, tmdb_id)
+    if details is None:
+        details = await get_movie_details(session, tmdb_id)
+        _ttl_put(_details_mem_cache, tmdb_id, details, DETAILS_MEM_CACHE_TTL_SECONDS, DETAILS_MEM_CACHE_MAXSIZE)
+    return details
+
+
+async def get_movie_details_overlapped(
+    session: AsyncSession,
+    tmdb_id: int,
+    db_work: Callable[[], Awaitable[None]],
+) -> MovieDetails:
+    """
+    get_movie_details + независимая работа с БД (db_work).
+    При промахе кеша HTTP-запрос к TMDB идёт параллельно с db_work.
+    Сессия используется строго последовательно (кеш -> db_work -> upsert кеша),
+    параллелен только сетевой запрос. Как и get_movie_details_cached, использует кеш в памяти.
+    """
+    details = _ttl_get(_details_mem_cache, tmdb_id)
+    if details is not None:
+        await db_work()
+        return details
+
+    cached = await _get_cached(session, TmdbMovieDetailsCache, tmdb_id)
+    if cached is not None:
+        await db_work()
+        data = cached
+    else:
+        fetch = asyncio.create_task(_tmdb_get(f"/movie/{tmdb_id}"))
+        try:
+            await db_work()
+        except BaseException:
+            fetch.cancel()
+            raise
+        data = await fetch
+        await _upsert_cache(session, TmdbMovieDetailsCache, tmdb_id, data)
+
+    details = movie_details_from_payload(tmdb_id, data)
+    _ttl_put(_details_mem_cache, tmdb_id, details, DETAILS_MEM_CACHE_TTL_SECONDS, DETAILS_MEM_CACHE_MAXSIZE)
+    return details
 
 
 async def get_movie_keywords(session: AsyncSession, tmdb_id: int) -> list[str]:
@@ -208,29 +344,35 @@ async def get_movie_keywords(session: AsyncSession, tmdb_id: int) -> list[str]:
     else:
         data = cached
 
-    keywords_raw = data.get("keywords", [])
-    keywords: list[str] = []
-    if isinstance(keywords_raw, list):
-        for k in keywords_raw:
-            if isinstance(k, dict) and k.get("name"):
-                keywords.append(str(k["name"]))
-    return keywords
+    return keywords_from_payload(data)
 
 
 async def get_similar(tmdb_id: int, page: int = 1) -> list[MovieCandidate]:
     """
-    Похожие фильмы (без кеша — можно добавить позже).
+    Похожие фильмы. Кешируются в памяти процесса на LIST_CACHE_TTL_SECONDS.
     """
+    key = ("similar", tmdb_id, page)
+    cached = _list_cache_get(key)
+    if cached is not None:
+        return cached
     data = await _tmdb_get(f"/movie/{tmdb_id}/similar", params={"page": page})
-    return _parse_candidate_list(data.get("results", []))
+    candidates = _parse_candidate_list(data.get("results", []))
+    _list_cache_put(key, candidates)
+    return candidates
 
 
 async def get_recommendations(tmdb_id: int, page: int = 1) -> list[MovieCandidate]:
     """
-    Рекомендации TMDB (без кеша — можно добавить позже).
+    Рекомендации TMDB. Кешируются в памяти процесса на LIST_CACHE_TTL_SECONDS.
     """
+    key = ("recommendations", tmdb_id, page)
+    cached = _list_cache_get(key)
+    if cached is not None:
+        return cached
     data = await _tmdb_get(f"/movie/{tmdb_id}/recommendations", params={"page": page})
-    return _parse_candidate_list(data.get("results", []))
+    candidates = _parse_candidate_list(data.get("results", []))
+    _list_cache_put(key, candidates)
+    return candidates
 
 
 # -------------------------
@@ -251,6 +393,21 @@ async def _get_cached(session: AsyncSession, model: Any, tmdb_id: int) -> Option
     return row.payload
 
 
+async def _get_cached_many(session: AsyncSession, model: Any, tmdb_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """
+    Пакетная версия _get_cached: один SELECT, только непротухшие записи.
+    """
+    if not tmdb_ids:
+        return {}
+    stmt = (
+        select(model.tmdb_id, model.payload)
+        .where(model.tmdb_id.in_(tmdb_ids))
+        .where(model.expires_at > _utcnow())
+    )
+    rows = (await session.execute(stmt)).all()
+    return {int(tmdb_id): payload for tmdb_id, payload in rows}
+
+
 async def _upsert_cache(session: AsyncSession, model: Any, tmdb_id: int, payload: dict[str, Any]) -> None:
     """
     Upsert кеша по tmdb_id.
@@ -274,6 +431,32 @@ async def _upsert_cache(session: AsyncSession, model: Any, tmdb_id: int, payload
     await session.commit()
 
 
+async def _upsert_cache_many(session: AsyncSession, model: Any, payloads: dict[int, dict[str, Any]]) -> None:
+    """
+    Пакетный upsert кеша: один INSERT ... ON CONFLICT на все tmdb_id.
+    """
+    if not payloads:
+        return
+    now = _utcnow()
+    expires = _expires_at()
+    stmt = insert(model).values(
+        [
+            {"tmdb_id": tmdb_id, "payload": payload, "fetched_at": now, "expires_at": expires}
+            for tmdb_id, payload in payloads.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.tmdb_id],
+        set_={
+            "payload": stmt.excluded.payload,
+            "fetched_at": stmt.excluded.fetched_at,
+            "expires_at": stmt.excluded.expires_at,
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+
+
 def _parse_candidate_list(results: Any) -> list[MovieCandidate]:
     candidates: list[MovieCandidate] = []
     if not isinstance(results, list):
@@ -326,6 +509,69 @@ async def get_movie_details_payload(session: AsyncSession, tmdb_id: int) -> dict
         return data
     return cached
 
+async def _get_payloads_many(
+    session: AsyncSession,
+    model: Any,
+    tmdb_ids: list[int],
+    path_template: str,
+    concurrency: int,
+) -> dict[int, dict[str, Any]]:
+    """
+    Кеш читаем одним запросом, промахи тянем из TMDB параллельно (с ограничением)
+    и пишем в кеш одним upsert. Сессия при этом используется последовательно.
+    id, по которым TMDB ответил ошибкой, в результат не попадают.
+    """
+    ids = list(dict.fromkeys(int(t) for t in tmdb_ids))
+    if not ids:
+        return {}
+
+    payloads = await _get_cached_many(session, model, ids)
+    missing = [tid for tid in ids if tid not in payloads]
+    if not missing:
+        return payloads
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def fetch(tid: int) -> dict[str, Any]:
+        async with sem:
+            return await _tmdb_get(path_template.format(tmdb_id=tid))
+
+    results = await asyncio.gather(*(fetch(tid) for tid in missing), return_exceptions=True)
+    fetched: dict[int, dict[str, Any]] = {}
+    for tid, res in zip(missing, results):
+        if isinstance(res, TMDBError):
+            continue
+        if isinstance(res, BaseException):
+            raise res
+        fetched[tid] = res
+
+    await _upsert_cache_many(session, model, fetched)
+    payloads.update(fetched)
+    return payloads
+
+
+async def get_movie_details_payloads(
+    session: AsyncSession,
+    tmdb_ids: list[int],
+    concurrency: int = 8,
+) -> dict[int, dict[str, Any]]:
+    """
+    Пакетная версия get_movie_details_payload (см. _get_payloads_many).
+    """
+    return await _get_payloads_many(session, TmdbMovieDetailsCache, tmdb_ids, "/movie/{tmdb_id}", concurrency)
+
+
+async def get_movie_keywords_payloads(
+    session: AsyncSession,
+    tmdb_ids: list[int],
+    concurrency: int = 8,
+) -> dict[int, dict[str, Any]]:
+    """
+    Пакетная версия кешируемых keywords (см. _get_payloads_many).
+    """
+    return await _get_payloads_many(session, TmdbMovieKeywordsCache, tmdb_ids, "/movie/{tmdb_id}/keywords", concurrency)
+
+
 async def get_movie_keywords_payload(session, tmdb_id: int) -> dict:
     # session оставляем в сигнатуре для совместимости (и будущего кеша),
     # но здесь можно напрямую сходить в TMDB (в тестах будет замокано).
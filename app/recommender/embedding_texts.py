@@ -1,6 +1,14 @@
 from __future__ import annotations
 
-from app.integrations.tmdb import get_movie_details, get_movie_keywords
+from app.integrations.tmdb import (
+    MovieDetails,
+    get_movie_details,
+    get_movie_details_payloads,
+    get_movie_keywords,
+    get_movie_keywords_payloads,
+    keywords_from_payload,
+    movie_details_from_payload,
+)
 
 
 async def build_review_text(title: str, year: int | None, rating: float | None, review: str | None) -> str:
@@ -13,10 +21,7 @@ async def build_review_text(title: str, year: int | None, rating: float | None,
     return "\n".join(parts).strip()
 
 
-async def build_film_meta_text(session, tmdb_id: int) -> str:
-    details = await get_movie_details(session, tmdb_id)
-    keywords = await get_movie_keywords(session, tmdb_id)
-
+def _format_film_meta_text(details: MovieDetails, keywords: list[str]) -> str:
     parts: list[str] = []
     parts.append(f"Title: {details.title} ({details.year})" if details.year else f"Title: {details.title}")
     if details.genres:
@@ -29,3 +34,26 @@ async def build_film_meta_text(session, tmdb_id: int) -> str:
         parts.append("Overview:\n" + details.overview.strip())
 
     return "\n".join(parts).strip()
+
+
+async def build_film_meta_text(session, tmdb_id: int) -> str:
+    details = await get_movie_details(session, tmdb_id)
+    keywords = await get_movie_keywords(session, tmdb_id)
+    return _format_film_meta_text(details, keywords)
+
+
+async def build_film_meta_texts(session, tmdb_ids: list[int]) -> dict[int, str]:
+    """
+    Пакетная версия build_film_meta_text: details и keywords грузятся пачками
+    (кеш одним запросом, промахи из TMDB параллельно).
+    Фильмы без details в результат не попадают; без keywords — текст без них.
+    """
+    details_payloads = await get_movie_details_payloads(session, tmdb_ids)
+    keywords_payloads = await get_movie_keywords_payloads(session, list(details_payloads))
+
+    texts: dict[int, str] = {}
+    for tmdb_id, payload in details_payloads.items():
+        details = movie_details_from_payload(tmdb_id, payload)
+        keywords = keywords_from_payload(keywords_payloads.get(tmdb_id, {}))
+        texts[tmdb_id] = _format_film_meta_text(details, keywords)
+    return texts
@@ -1,16 +1,16 @@
 from __future__ import annotations
 
-import asyncio
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any
 
+import numpy as np
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import WatchedFilm
 from app.db.repositories.taste_profile import upsert_taste_profile
-from app.integrations.tmdb import get_movie_details_payload
+from app.integrations.tmdb import get_movie_details_payloads
 from datetime import datetime, UTC
 
 
@@ -26,10 +26,61 @@ def _decade_from_year(year: int | None) -> int | None:
     return (year // 10) * 10
 
 
-def _top_items(counts: dict[Any, int], top_n: int = 8) -> list[dict]:
-    total = sum(counts.values()) or 1
-    items = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:top_n]
-    return [{"key": k, "count": v, "score": round(v / total, 4)} for k, v in items]
+def _top_items(keys: list[Any], top_n: int = 8) -> list[dict]:
+    """
+    Частоты ключей: коды в порядке первого появления + np.bincount.
+    Стабильная сортировка по убыванию — при равенстве порядок первого появления.
+    """
+    if not keys:
+        return []
+    index: dict[Any, int] = {}
+    codes = np.fromiter((index.setdefault(k, len(index)) for k in keys), dtype=np.intp, count=len(keys))
+    counts = np.bincount(codes)
+    order = np.argsort(-counts, kind="stable")[:top_n]
+    uniq = list(index)
+    total = len(keys)
+    return [{"key": uniq[i], "count": int(counts[i]), "score": round(int(counts[i]) / total, 4)} for i in order.tolist()]
+
+
+def _genre_ids(payload: dict[str, Any], genre_names: dict[int, str]) -> list[int]:
+    genres = payload.get("genres", [])
+    if not isinstance(genres, list):
+        return []
+    out = []
+    for g in genres:
+        if not isinstance(g, dict):
+            continue
+        gid = g.get("id")
+        name = g.get("name")
+        if isinstance(gid, int):
+            out.append(gid)
+            if isinstance(name, str) and name:
+                genre_names[gid] = name
+    return out
+
+
+def _decade(payload: dict[str, Any]) -> int | None:
+    release_date = payload.get("release_date")
+    year = None
+    if isinstance(release_date, str) and len(release_date) >= 4 and release_date[:4].isdigit():
+        year = int(release_date[:4])
+    return _decade_from_year(year)
+
+
+def _country_codes(payload: dict[str, Any], country_names: dict[str, str]) -> list[str]:
+    countries = payload.get("production_countries", [])
+    if not isinstance(countries, list):
+        return []
+    out = []
+    for c in countries:
+        if not isinstance(c, dict):
+            continue
+        code = c.get("iso_3166_1")
+        name = c.get("name")
+        if isinstance(code, str) and code:
+            out.append(code)
+            country_names.setdefault(code, name if isinstance(name, str) else code)
+    return out
 
 
 def _format_decade(dec: int) -> str:
@@ -90,92 +141,45 @@ async def update_taste_profile_v0(
     liked = [r for r in rated if r.rating >= like_threshold]
     disliked = [r for r in rated if r.rating <= dislike_threshold]
 
-    # 2) Подтянуть детали (кешируются) — параллельно и с ограничением
-    sem = asyncio.Semaphore(8)
-
-    async def load_payload(tmdb_id: int) -> dict[str, Any]:
-        async with sem:
-            return await get_movie_details_payload(session, tmdb_id)
-
+    # 2) Подтянуть детали: кеш одним SELECT, промахи параллельно из TMDB и одним upsert в кеш.
     # Чтобы не качать лишнее, берём только из liked/disliked
     need_ids = list({r.tmdb_id for r in liked + disliked})
-    payloads: dict[int, dict[str, Any]] = {}
-
-    tasks = [asyncio.create_task(load_payload(tid)) for tid in need_ids]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    for tmdb_id, res in zip(need_ids, results):
-        if isinstance(res, Exception):
-            continue
-        payloads[tmdb_id] = res
-
-    # 3) Считаем статистику
-    liked_genres: dict[int, int] = {}
-    disliked_genres: dict[int, int] = {}
-    liked_decades: dict[int, int] = {}
-    liked_countries: dict[str, dict[str, int]] = {}  # code -> {name,count}
+    payloads: dict[int, dict[str, Any]] = await get_movie_details_payloads(session, need_ids)
 
+    # 3) Считаем статистику: из payload только вытаскиваем ключи плоскими списками,
+    # частоты и топы — векторно в _top_items
     genre_names: dict[int, str] = {}
-
-    def ingest_genres(target: dict[int, int], payload: dict[str, Any]) -> None:
-        genres = payload.get("genres", [])
-        if not isinstance(genres, list):
-            return
-        for g in genres:
-            if not isinstance(g, dict):
-                continue
-            gid = g.get("id")
-            name = g.get("name")
-            if isinstance(gid, int):
-                target[gid] = target.get(gid, 0) + 1
-                if isinstance(name, str) and name:
-                    genre_names[gid] = name
-
-    def ingest_liked_extra(payload: dict[str, Any]) -> None:
-        # decade
-        release_date = payload.get("release_date")
-        year = None
-        if isinstance(release_date, str) and len(release_date) >= 4 and release_date[:4].isdigit():
-            year = int(release_date[:4])
-        dec = _decade_from_year(year)
-        if dec is not None:
-            liked_decades[dec] = liked_decades.get(dec, 0) + 1
-
-        # countries
-        countries = payload.get("production_countries", [])
-        if isinstance(countries, list):
-            for c in countries:
-                if not isinstance(c, dict):
-                    continue
-                code = c.get("iso_3166_1")
-                name = c.get("name")
-                if isinstance(code, str) and code:
-                    if code not in liked_countries:
-                        liked_countries[code] = {"name": name if isinstance(name, str) else code, "count": 0}
-                    liked_countries[code]["count"] += 1
+    country_names: dict[str, str] = {}  # code -> name (первое встретившееся)
+    liked_genre_ids: list[int] = []
+    disliked_genre_ids: list[int] = []
+    liked_decade_keys: list[int] = []
+    liked_country_codes: list[str] = []
 
     for r in liked:
         payload = payloads.get(r.tmdb_id)
         if not payload:
             continue
-        ingest_genres(liked_genres, payload)
-        ingest_liked_extra(payload)
+        liked_genre_ids.extend(_genre_ids(payload, genre_names))
+        dec = _decade(payload)
+        if dec is not None:
+            liked_decade_keys.append(dec)
+        liked_country_codes.extend(_country_codes(payload, country_names))
 
     for r in disliked:
         payload = payloads.get(r.tmdb_id)
         if not payload:
             continue
-        ingest_genres(disliked_genres, payload)
+        disliked_genre_ids.extend(_genre_ids(payload, genre_names))
 
     # 4) Собираем weights_json
-    liked_genres_top = _top_items(liked_genres, top_n=10)
-    disliked_genres_top = _top_items(disliked_genres, top_n=10)
-    liked_decades_top = _top_items(liked_decades, top_n=8)
+    liked_genres_top = _top_items(liked_genre_ids, top_n=10)
+    disliked_genres_top = _top_items(disliked_genre_ids, top_n=10)
+    liked_decades_top = _top_items(liked_decade_keys, top_n=8)
 
     # страны
-    countries_list = sorted(liked_countries.items(), key=lambda kv: kv[1]["count"], reverse=True)[:8]
     liked_countries_top = [
-        {"code": code, "name": meta["name"], "count": meta["count"], "score": round(meta["count"] / (sum(v["count"] for v in liked_countries.values()) or 1), 4)}
-        for code, meta in countries_list
+        {"code": it["key"], "name": country_names[it["key"]], "count": it["count"], "score": it["score"]}
+        for it in _top_items(liked_country_codes, top_n=8)
     ]
 
     # Подменим key->id/name для жанров
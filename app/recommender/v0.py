@@ -122,6 +122,17 @@ def _dedupe_candidates(cands: list[tmdb.MovieCandidate]) -> dict[int, tmdb.Movie
     return by_id
 
 
+def _filter_candidates(
+    by_id: dict[int, tmdb.MovieCandidate],
+    *excluded: set[int],
+) -> list[tmdb.MovieCandidate]:
+    """
+    Убирает кандидатов, чей tmdb_id есть хоть в одном из множеств (просмотренное, недавние рекомендации, seeds).
+    Порядок by_id сохраняется.
+    """
+    return [c for tmdb_id, c in by_id.items() if not any(tmdb_id in ex for ex in excluded)]
+
+
 def _pick_safe(
     candidates: list[tmdb.MovieCandidate],
     genre_weights: dict[int, float],
@@ -282,16 +293,7 @@ async def recommend_v0(
     by_id = _dedupe_candidates(pool)
 
     # 6) фильтры
-    filtered: list[tmdb.MovieCandidate] = []
-    seed_set = set(seed_tmdb_ids)
-    for tmdb_id, c in by_id.items():
-        if tmdb_id in watched:
-            continue
-        if tmdb_id in recent_recs:
-            continue
-        if tmdb_id in seed_set:
-            continue
-        filtered.append(c)
+    filtered = _filter_candidates(by_id, watched, recent_recs, set(seed_tmdb_ids))
 
     if not filtered:
         return []
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
 import logging
+import re
+import time
 from dataclasses import dataclass
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
+from typing import Any
 
+import numpy as np
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -21,11 +26,12 @@ from app.db.repositories.taste_profile import set_avoids_json
 from app.integrations.tmdb import (
     get_similar,
     get_recommendations,
-    get_movie_details_payload,
+    get_movie_details_payloads,
+    shared_http_client,
     MovieCandidate,
     TMDBError,
 )
-from app.recommender.vector_math import cosine_similarity, weighted_average
+from app.recommender.vector_math import normalize_rows, normalized_weighted_centroid
 
 logger = logging.getLogger("recommender.v1")
 
@@ -52,10 +58,6 @@ class RecPickV1:
     triggered_avoid_ids: list[str]
 
 
-def _clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
-
-
 def _decade_from_release_date(release_date: str | None) -> int | None:
     if not release_date or not isinstance(release_date, str) or len(release_date) < 4:
         return None
@@ -113,23 +115,63 @@ def _build_text_for_soft_avoid(payload: dict) -> str:
     return "\n".join(parts)
 
 
-def _soft_avoid_penalty(content_text: str, avoids_json: dict) -> tuple[float, list[str]]:
+@dataclass(frozen=True)
+class ActiveAvoidPattern:
+    pid: str
+    penalty: float  # положительный: -weight
+    keywords: tuple[str, ...]  # strip().lower()
+
+
+@dataclass(frozen=True)
+class AvoidKeywordMatcher:
+    """
+    Все keywords всех паттернов одним regex: один проход по тексту вместо
+    P·K проверок `kw in text`.
     """
-    penalty по ключевым словам.
+    regex: re.Pattern[str]
+    # keyword -> индексы паттернов, чьи keywords являются его подстроками
+    pattern_idx_by_keyword: dict[str, frozenset[int]]
+
+    def hits(self, text: str) -> set[int]:
+        # regex без учёта регистра: text.lower() не нужен, lower() только у найденных keywords
+        out: set[int] = set()
+        for found in set(self.regex.findall(text)):
+            out |= self.pattern_idx_by_keyword.get(found.lower(), frozenset())
+        return out
+
+
+def _cooldown_until_ts(last_triggered: Any, cooldown_days: int) -> float:
+    """
+    Unix ts, начиная с которого паттерн снова может сработать (0.0 — cooldown нет).
+    """
+    if not isinstance(last_triggered, str) or not last_triggered:
+        return 0.0
+    try:
+        last_dt = datetime.fromisoformat(last_triggered)  # py3.11+: понимает и "Z"
+    except ValueError:
+        return 0.0
+    if last_dt.tzinfo is None:
+        # naive даты никогда не блокировали паттерн — сохраняем это поведение
+        return 0.0
+    return last_dt.timestamp() + cooldown_days * 86400.0
+
+
+def _prepare_avoids(avoids_json: dict) -> list[ActiveAvoidPattern]:
+    """
+    Разбор avoids_json один раз на пользователя.
     avoids_json["patterns"] -> list[ {id, confidence, weight(<0), cooldown_days, last_triggered, keywords[]} ]
+    Остаются только паттерны, которые сейчас могут сработать: confidence >= 0.6,
+    weight < 0, cooldown прошёл, есть хотя бы один keyword.
     """
     if not avoids_json or not isinstance(avoids_json, dict):
-        return 0.0, []
+        return []
 
     patterns = avoids_json.get("patterns", [])
-    if not isinstance(patterns, list) or not patterns or not content_text:
-        return 0.0, []
+    if not isinstance(patterns, list):
+        return []
 
-    now = datetime.now(timezone.utc)
-    text = content_text.lower()
-
-    total_penalty = 0.0
-    triggered: list[str] = []
+    now_ts = time.time()
+    active: list[ActiveAvoidPattern] = []
 
     for p in patterns:
         if not isinstance(p, dict):
@@ -147,33 +189,64 @@ def _soft_avoid_penalty(content_text: str, avoids_json: dict) -> tuple[float, li
         if weight >= 0:
             continue
 
-        last = p.get("last_triggered")
-        if isinstance(last, str) and last:
-            try:
-                last_dt = datetime.fromisoformat(last.replace("Z", "+00:00"))
-                if now - last_dt < timedelta(days=cooldown_days):
-                    continue
-            except Exception:
-                pass
+        if now_ts < _cooldown_until_ts(p.get("last_triggered"), cooldown_days):
+            continue
 
         keywords = p.get("keywords", [])
-        if not isinstance(keywords, list) or not keywords:
+        if not isinstance(keywords, list):
+            continue
+        kws = tuple(kw.strip().lower() for kw in keywords if isinstance(kw, str) and kw.strip())
+        if not kws:
             continue
 
-        hit = False
-        for kw in keywords:
-            if not isinstance(kw, str):
-                continue
-            kw_norm = kw.strip().lower()
-            if not kw_norm:
-                continue
-            if kw_norm in text:
-                hit = True
-                break
-
-        if hit:
-            total_penalty += (-weight)  # делаем положительный penalty
-            triggered.append(pid)
+        active.append(ActiveAvoidPattern(pid=pid, penalty=-weight, keywords=kws))
+
+    return active
+
+
+def _build_avoid_matcher(active: list[ActiveAvoidPattern]) -> AvoidKeywordMatcher | None:
+    idx_by_keyword: dict[str, set[int]] = {}
+    for idx, p in enumerate(active):
+        for kw in p.keywords:
+            idx_by_keyword.setdefault(kw, set()).add(idx)
+
+    if not idx_by_keyword:
+        return None
+
+    # Lookahead ловит совпадение на каждой позиции, но только самое длинное
+    # из начинающихся там. Поэтому каждому keyword приписываем и паттерны всех
+    # keywords, которые в нём содержатся — семантика та же, что у `kw in text`.
+    keywords_sorted = sorted(idx_by_keyword, key=len, reverse=True)
+    closure: dict[str, frozenset[int]] = {}
+    for kw in keywords_sorted:
+        idxs: set[int] = set()
+        for other, other_idxs in idx_by_keyword.items():
+            if other in kw:
+                idxs |= other_idxs
+        closure[kw] = frozenset(idxs)
+
+    regex = re.compile("(?=(" + "|".join(re.escape(kw) for kw in keywords_sorted) + "))", re.IGNORECASE)
+    return AvoidKeywordMatcher(regex=regex, pattern_idx_by_keyword=closure)
+
+
+def _soft_avoid_penalty(
+    content_text: str,
+    active: list[ActiveAvoidPattern],
+    matcher: AvoidKeywordMatcher | None,
+) -> tuple[float, list[str]]:
+    """
+    penalty по ключевым словам (регистр не важен, текст не lower'им).
+    active/matcher готовятся один раз на пользователя (_prepare_avoids/_build_avoid_matcher).
+    """
+    if matcher is None or not content_text:
+        return 0.0, []
+
+    total_penalty = 0.0
+    triggered: list[str] = []
+    for idx in sorted(matcher.hits(content_text)):
+        p = active[idx]
+        total_penalty += p.penalty
+        triggered.append(p.pid)
 
     return total_penalty, triggered
 
@@ -187,91 +260,107 @@ def _assign_strategy(sim_like: float, novelty: float) -> str:
 
 def _mmr_select(
     scored: list[V1CandidateScore],
-    vecs: dict[int, list[float]],
+    vecs: dict[int, np.ndarray],
     k: int,
     lambda_relevance: float = 0.75,
 ) -> list[V1CandidateScore]:
-    if not scored:
+    if not scored or k <= 0:
         return []
-
-    remaining = scored[:]
-    remaining.sort(key=lambda x: x.base_score, reverse=True)
+    if k == 1:
+        # первый шаг MMR — всегда argmax base_score
+        return [max(scored, key=lambda x: x.base_score)]
+
+    # Отсечка: пока выбрано < k, среди top-k по base_score есть невыбранный
+    # с mmr >= λ·b_k - (1-λ) (redundancy <= 1). Кандидат с λ·b < λ·b_k - (1-λ)
+    # не победит даже при нулевой redundancy — в MMR его не берём.
+    pool = scored
+    if lambda_relevance > 0 and len(scored) > k:
+        b_k = heapq.nlargest(k, scored, key=lambda x: x.base_score)[-1].base_score
+        threshold = b_k - (1.0 - lambda_relevance) / lambda_relevance
+        pool = [c for c in scored if c.base_score >= threshold]
+
+    remaining = sorted(pool, key=lambda x: x.base_score, reverse=True)
+    n = len(remaining)
+
+    # Матрица нормализованных векторов пула; у кого вектора нет — нулевая строка
+    dim = next((len(v) for v in (vecs.get(c.tmdb_id) for c in remaining) if v is not None and len(v)), 0)
+    has_vec = np.zeros(n, dtype=bool)
+    C = np.zeros((n, dim), dtype=np.float32)
+    for i, cand in enumerate(remaining):
+        v = vecs.get(cand.tmdb_id)
+        if v is not None and len(v) == dim and dim:
+            C[i] = v
+            has_vec[i] = True
+    C = normalize_rows(C)
+
+    # Все попарные косинусы одним GEMM, отрицательные не считаем redundancy
+    S = np.clip(C @ C.T, 0.0, None)
+
+    base = np.fromiter((c.base_score for c in remaining), dtype=np.float64, count=n)
+    available = np.ones(n, dtype=bool)
+    max_redundancy = np.zeros(n, dtype=np.float64)
 
     selected: list[V1CandidateScore] = []
     selected_ids: set[int] = set()
 
-    while remaining and len(selected) < k:
+    while available.any() and len(selected) < k:
         if not selected:
-            best = remaining.pop(0)
-            selected.append(best)
-            selected_ids.add(best.tmdb_id)
-            continue
+            best_idx = 0
+        else:
+            redundancy = np.where(has_vec, max_redundancy, 0.2)
+            mmr = lambda_relevance * base - (1.0 - lambda_relevance) * redundancy
+            mmr[~available] = -np.inf
+            best_idx = int(np.argmax(mmr))
 
-        best_idx = None
-        best_mmr = None
-
-        for idx, cand in enumerate(remaining):
-            v = vecs.get(cand.tmdb_id)
-            if not v:
-                redundancy = 0.2
-            else:
-                redundancy = 0.0
-                for s in selected:
-                    sv = vecs.get(s.tmdb_id)
-                    if not sv:
-                        continue
-                    redundancy = max(redundancy, max(0.0, cosine_similarity(v, sv)))
-
-            mmr = lambda_relevance * cand.base_score - (1.0 - lambda_relevance) * redundancy
-            if best_mmr is None or mmr > best_mmr:
-                best_mmr = mmr
-                best_idx = idx
-
-        if best_idx is None:
-            break
-
-        best = remaining.pop(best_idx)
+        available[best_idx] = False
+        best = remaining[best_idx]
         if best.tmdb_id in selected_ids:
             continue
 
         selected.append(best)
         selected_ids.add(best.tmdb_id)
+        np.maximum(max_redundancy, S[:, best_idx], out=max_redundancy)
 
     return selected
 
 
-async def _fetch_candidates_pool(seed_tmdb_ids: list[int]) -> list[MovieCandidate]:
-    sem = asyncio.Semaphore(8)
+async def _fetch_candidates_pool(seed_tmdb_ids: list[int], per_endpoint_limit: int = 10) -> list[MovieCandidate]:
+    """
+    similar + recommendations по каждому seed. У эндпоинтов свои семафоры,
+    чтобы медленный similar не держал recommendations; ошибка одного эндпоинта
+    не выкидывает результат другого. Все запросы идут через один HTTP-клиент.
+    """
+    sim_sem = asyncio.Semaphore(per_endpoint_limit)
+    rec_sem = asyncio.Semaphore(per_endpoint_limit)
 
-    async def one(seed: int) -> list[MovieCandidate]:
+    async def guarded(sem: asyncio.Semaphore, fetch, seed: int) -> list[MovieCandidate]:
         async with sem:
             try:
-                sim_task = asyncio.create_task(get_similar(seed, page=1))
-                rec_task = asyncio.create_task(get_recommendations(seed, page=1))
-                sim, recs = await asyncio.gather(sim_task, rec_task)
-                return (sim or []) + (recs or [])
+                return (await fetch(seed, page=1)) or []
             except TMDBError:
                 return []
 
-    tasks = [asyncio.create_task(one(s)) for s in seed_tmdb_ids]
-    chunks = await asyncio.gather(*tasks)
+    seeds = list(dict.fromkeys(seed_tmdb_ids))
+    async with shared_http_client():
+        chunks = await asyncio.gather(
+            *(guarded(sim_sem, get_similar, s) for s in seeds),
+            *(guarded(rec_sem, get_recommendations, s) for s in seeds),
+        )
     return [c for ch in chunks for c in ch]
 
 
+def _pool_quality(c: MovieCandidate) -> float:
+    return (c.vote_average or 0) + (c.popularity or 0) / 100
+
+
 def _dedupe_pool(pool: list[MovieCandidate]) -> dict[int, MovieCandidate]:
-    by_id: dict[int, MovieCandidate] = {}
-    for c in pool:
-        if not c.tmdb_id:
-            continue
-        if c.tmdb_id not in by_id:
-            by_id[c.tmdb_id] = c
-        else:
-            cur = by_id[c.tmdb_id]
-            cur_q = (cur.vote_average or 0) + (cur.popularity or 0) / 100
-            new_q = (c.vote_average or 0) + (c.popularity or 0) / 100
-            if new_q > cur_q:
-                by_id[c.tmdb_id] = c
-    return by_id
+    """
+    Дедуп по tmdb_id, остаётся вариант с максимальным _pool_quality.
+    Сортируем один раз по возрастанию quality, дальше dict оставляет последний.
+    reversed + стабильная сортировка: при равной quality побеждает более ранний.
+    """
+    ranked = sorted(reversed(pool), key=_pool_quality)
+    return {c.tmdb_id: c for c in ranked if c.tmdb_id}
 
 
 async def _build_like_dislike_vectors(
@@ -280,7 +369,7 @@ async def _build_like_dislike_vectors(
     like_thr: float = 4.0,
     dislike_thr: float = 2.5,
     max_films: int = 200,
-) -> tuple[list[float] | None, list[float] | None]:
+) -> tuple[np.ndarray | None, np.ndarray | None]:
     """
     Берём фильмы с оценками:
     - likes: rating >= like_thr
@@ -289,6 +378,8 @@ async def _build_like_dislike_vectors(
     Предпочтение:
     - review embeddings (если они keyed по tmdb_id)
     - иначе film_meta embeddings
+
+    Возвращаем нормализованные центроиды: дальше они используются только через cosine.
     """
     stmt = (
         select(WatchedFilm.tmdb_id, WatchedFilm.your_rating)
@@ -309,70 +400,98 @@ async def _build_like_dislike_vectors(
     film_like = await get_film_meta_embeddings(session, user_id, liked_tmdb_ids)
     film_dislike = await get_film_meta_embeddings(session, user_id, disliked_tmdb_ids)
 
-    like_vectors: list[tuple[list[float], float]] = []
-    for tid in liked_tmdb_ids:
-        emb = review_like.get(tid)
-        if emb is not None:
-            like_vectors.append((list(emb), 1.25))
-    for tid in liked_tmdb_ids:
-        emb = film_like.get(tid)
-        if emb is not None:
-            like_vectors.append((list(emb), 1.0))
-
-    dislike_vectors: list[tuple[list[float], float]] = []
-    for tid in disliked_tmdb_ids:
-        emb = review_dislike.get(tid)
-        if emb is not None:
-            dislike_vectors.append((list(emb), 1.25))
-    for tid in disliked_tmdb_ids:
-        emb = film_dislike.get(tid)
-        if emb is not None:
-            dislike_vectors.append((list(emb), 1.0))
-
-    like_vec = weighted_average(like_vectors)
-    dislike_vec = weighted_average(dislike_vectors)
+    def centroid(tmdb_ids: list[int], review_map: dict, film_map: dict):
+        # review-эмбеддинги весомее, чем film_meta
+        vectors = [review_map[tid] for tid in tmdb_ids if tid in review_map]
+        weights = [1.25] * len(vectors)
+        film_vectors = [film_map[tid] for tid in tmdb_ids if tid in film_map]
+        vectors += film_vectors
+        weights += [1.0] * len(film_vectors)
+        return normalized_weighted_centroid(vectors, weights)
+
+    like_vec = centroid(liked_tmdb_ids, review_like, film_like)
+    dislike_vec = centroid(disliked_tmdb_ids, review_dislike, film_dislike)
     return like_vec, dislike_vec
 
 
-async def _repeat_context_counts(
-    session: AsyncSession,
+def _repeat_features(payloads: dict[int, dict]) -> dict[int, tuple[list[int], int | None]]:
+    """
+    tmdb_id -> (genre_ids, decade): payload разбираем один раз,
+    дальше и контекст, и кандидаты читают готовые признаки.
+    """
+    return {
+        tid: (_extract_genre_ids(p), _decade_from_release_date(p.get("release_date")))
+        for tid, p in payloads.items()
+    }
+
+
+def _repeat_context_counts(
+    features: dict[int, tuple[list[int], int | None]],
     tmdb_ids: list[int],
 ) -> tuple[dict[int, int], dict[int, int]]:
     genre_counts: dict[int, int] = {}
     decade_counts: dict[int, int] = {}
 
     for tid in tmdb_ids:
-        payload = await get_movie_details_payload(session, tid)
-        for gid in _extract_genre_ids(payload):
+        feat = features.get(tid)
+        if feat is None:
+            continue
+        gids, dec = feat
+        for gid in gids:
             genre_counts[gid] = genre_counts.get(gid, 0) + 1
-        dec = _decade_from_release_date(payload.get("release_date"))
         if dec is not None:
             decade_counts[dec] = decade_counts.get(dec, 0) + 1
 
     return genre_counts, decade_counts
 
 
-def _repeat_penalty_for_candidate(
-    cand_payload: dict,
+def _freq_lookup(counts: dict[int, int], keys: np.ndarray, total_context: int) -> np.ndarray:
+    """
+    counts.get(key, 0) / total_context для массива ключей — через searchsorted.
+    """
+    if not counts or keys.size == 0:
+        return np.zeros(keys.size, dtype=np.float64)
+    known = np.fromiter(sorted(counts), dtype=np.int64, count=len(counts))
+    freqs = np.fromiter((counts[k] for k in known.tolist()), dtype=np.float64, count=len(counts)) / total_context
+    pos = np.minimum(np.searchsorted(known, keys), known.size - 1)
+    return np.where(known[pos] == keys, freqs[pos], 0.0)
+
+
+def _repeat_penalties(
+    features: dict[int, tuple[list[int], int | None]],
+    tmdb_ids: list[int],
     genre_counts: dict[int, int],
     decade_counts: dict[int, int],
     total_context: int,
-) -> float:
-    if total_context <= 0:
-        return 0.0
+) -> np.ndarray:
+    """
+    repeat penalty для всех кандидатов разом:
+    0.20 * sum(freq жанров, первые 4) + 0.12 * freq десятилетия, clamp [0, 0.5].
+    Жанры — ragged-список, раскладываем в плоский массив + bincount по владельцу.
+    """
+    n = len(tmdb_ids)
+    if total_context <= 0 or n == 0:
+        return np.zeros(n, dtype=np.float64)
+
+    flat_gids: list[int] = []
+    owners: list[int] = []
+    decades = np.zeros(n, dtype=np.int64)
+    has_decade = np.zeros(n, dtype=bool)
+    for i, tid in enumerate(tmdb_ids):
+        gids, dec = features.get(tid, ([], None))
+        top = gids[:4]
+        flat_gids.extend(top)
+        owners.extend([i] * len(top))
+        if dec is not None:
+            decades[i] = dec
+            has_decade[i] = True
 
-    penalty = 0.0
-    gids = _extract_genre_ids(cand_payload)
-    for gid in gids[:4]:
-        freq = genre_counts.get(gid, 0) / total_context
-        penalty += 0.20 * freq
+    genre_freq = _freq_lookup(genre_counts, np.asarray(flat_gids, dtype=np.int64), total_context)
+    genre_part = np.bincount(np.asarray(owners, dtype=np.int64), weights=genre_freq, minlength=n)
 
-    dec = _decade_from_release_date(cand_payload.get("release_date"))
-    if dec is not None:
-        freq = decade_counts.get(dec, 0) / total_context
-        penalty += 0.12 * freq
+    decade_freq = np.where(has_decade, _freq_lookup(decade_counts, decades, total_context), 0.0)
 
-    return _clamp(penalty, 0.0, 0.5)
+    return np.clip(0.20 * genre_part + 0.12 * decade_freq, 0.0, 0.5)
 
 
 async def recommend_v1(
@@ -425,7 +544,8 @@ async def recommend_v1(
         user_id,
     )
 
-    cand_vecs: dict[int, list[float]] = {int(tid): list(vec) for tid, vec in emb_map.items()}
+    # уже L2-нормализованные float16
+    cand_vecs: dict[int, np.ndarray] = {int(tid): vec for tid, vec in emb_map.items()}
 
     # Если эмбеддингов мало — лучше не выдавать “пустую” v1
     min_needed = max(10, count * 2)
@@ -439,7 +559,7 @@ async def recommend_v1(
     # 7) novelty: сравнение с недавними рекомендациями
     recent_ids = await get_recent_recommended_tmdb_ids(session, user_id, days=recent_days, limit=150)
     recent_emb_map = await get_film_meta_embeddings(session, user_id, recent_ids)
-    recent_vecs = [list(v) for v in recent_emb_map.values()]
+    recent_vecs = list(recent_emb_map.values())
 
     # 8) repeat context: последние рекомендации + просмотры
     context_ids: list[int] = []
@@ -447,38 +567,54 @@ async def recommend_v1(
     context_ids += (await get_recent_watched_tmdb_ids(session, user_id, limit=40))
     context_ids = list(dict.fromkeys(context_ids))[:80]
 
-    genre_counts, decade_counts = await _repeat_context_counts(session, context_ids)
+    # детали (кешируются) одним пакетом и для контекста, и для кандидатов:
+    # используем и для repeat, и для soft-avoid текста
+    scored_ids = [c.tmdb_id for c in candidates if c.tmdb_id in cand_vecs]
+    payloads = await get_movie_details_payloads(session, context_ids + scored_ids)
+
+    features = _repeat_features(payloads)
+    genre_counts, decade_counts = _repeat_context_counts(features, context_ids)
     total_context = max(1, len(context_ids))
 
     # 9) avoids_json
     profile = (await session.execute(select(TasteProfile).where(TasteProfile.user_id == user_id))).scalar_one_or_none()
     avoids_json = (profile.avoids_json if profile else {}) or {}
+    active_avoids = _prepare_avoids(avoids_json)
+    avoid_matcher = _build_avoid_matcher(active_avoids)
 
     # 10) scoring
-    scored: list[V1CandidateScore] = []
-    for c in candidates:
-        tid = c.tmdb_id
-        vec = cand_vecs.get(tid)
-        if not vec:
-            continue  # нет вектора => пропускаем в v1
-
-        sim_like = cosine_similarity(vec, like_vec) if like_vec else 0.0
-        sim_dislike = cosine_similarity(vec, dislike_vec) if dislike_vec else 0.0
+    # Кандидаты без вектора в v1 пропускаем. Вектора нормализованы, поэтому
+    # cosine к like/dislike — просто C @ v. Храним в float16, а GEMM считаем
+    # в float32: в NumPy у float16 нет BLAS-ядра.
+    C = np.stack([cand_vecs[tid] for tid in scored_ids]).astype(np.float32)
+    sims_like = C @ like_vec.astype(np.float32) if like_vec is not None else np.zeros(len(scored_ids))
+    sims_dislike = C @ dislike_vec.astype(np.float32) if dislike_vec is not None else np.zeros(len(scored_ids))
+
+    # novelty = 1 - max_sim_to_recent: одна матрица C @ R.T на всех кандидатов
+    if recent_vecs:
+        R = np.stack(recent_vecs).astype(np.float32)
+        max_sim_recent = np.clip((C @ R.T).max(axis=1), 0.0, None)
+    else:
+        max_sim_recent = np.zeros(len(scored_ids), dtype=np.float32)
+    novelties = np.clip(1.0 - max_sim_recent, 0.0, 1.0)
+
+    repeat_pens = _repeat_penalties(features, scored_ids, genre_counts, decade_counts, total_context)
 
-        # novelty = 1 - max_sim_to_recent
-        max_sim_recent = 0.0
-        if recent_vecs:
-            for rv in recent_vecs:
-                max_sim_recent = max(max_sim_recent, max(0.0, cosine_similarity(vec, rv)))
-        novelty = _clamp(1.0 - max_sim_recent, 0.0, 1.0)
+    scored: list[V1CandidateScore] = []
+    for i, tid in enumerate(scored_ids):
+        sim_like = float(sims_like[i])
+        sim_dislike = float(sims_dislike[i])
+        novelty = float(novelties[i])
 
-        # детали кандидата одним payload (используем и для repeat, и для soft-avoid текста)
-        cand_payload = await get_movie_details_payload(session, tid)
+        cand_payload = payloads.get(tid, {})
 
-        repeat_pen = _repeat_penalty_for_candidate(cand_payload, genre_counts, decade_counts, total_context)
+        repeat_pen = float(repeat_pens[i])
 
-        content_text = _build_text_for_soft_avoid(cand_payload)
-        soft_pen, triggered_ids = _soft_avoid_penalty(content_text, avoids_json)
+        if avoid_matcher is not None:
+            content_text = _build_text_for_soft_avoid(cand_payload)
+            soft_pen, triggered_ids = _soft_avoid_penalty(content_text, active_avoids, avoid_matcher)
+        else:
+            soft_pen, triggered_ids = 0.0, []
 
         base = (
             1.0 * sim_like
@@ -1,43 +1,31 @@
 from __future__ import annotations
 
-import math
-from typing import Iterable
+import numpy as np
 
 
-def cosine_similarity(a: list[float], b: list[float]) -> float:
+def normalize_rows(m: np.ndarray) -> np.ndarray:
     """
-    Cosine similarity [-1..1]. Если один из векторов нулевой — 0.
+    L2-нормализация строк матрицы. Нулевые строки остаются нулевыми.
     """
-    if not a or not b or len(a) != len(b):
-        return 0.0
-    dot = 0.0
-    na = 0.0
-    nb = 0.0
-    for x, y in zip(a, b):
-        dot += x * y
-        na += x * x
-        nb += y * y
-    if na <= 0.0 or nb <= 0.0:
-        return 0.0
-    return dot / (math.sqrt(na) * math.sqrt(nb))
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return np.divide(m, norms, out=np.zeros_like(m), where=norms > 0)
 
 
-def weighted_average(vectors_with_w: Iterable[tuple[list[float], float]]) -> list[float] | None:
+def normalized_weighted_centroid(vectors: list, weights: list[float]) -> np.ndarray | None:
     """
-    Считает weighted average. Возвращает None, если нет ни одного вектора.
+    Взвешенное среднее L2-нормализованных векторов, само тоже нормализовано.
+    Для косинусного сравнения эквивалентно "среднему направлению" набора.
+    Возвращает None, если нет ни одного вектора с положительным весом.
     """
-    acc = None
-    total_w = 0.0
-    for vec, w in vectors_with_w:
-        if not vec or w <= 0:
-            continue
-        if acc is None:
-            acc = [0.0] * len(vec)
-        for i, x in enumerate(vec):
-            acc[i] += x * w
-        total_w += w
-
-    if acc is None or total_w <= 0:
+    pairs = [(v, w) for v, w in zip(vectors, weights) if v is not None and len(v) and w > 0]
+    if not pairs:
         return None
 
-    return [x / total_w for x in acc]
+    L = normalize_rows(np.asarray([v for v, _ in pairs], dtype=np.float32))
+    w = np.asarray([w for _, w in pairs], dtype=np.float32)
+    centroid = (L * w[:, None]).sum(axis=0) / w.sum()
+
+    norm = float(np.linalg.norm(centroid))
+    if norm <= 0.0:
+        return None
+    return centroid / norm
@@ -7,8 +7,8 @@ from sqlalchemy import select, func
 from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.db.models import User, WatchedFilm
-from app.db.repositories.embeddings import enqueue_embedding_job
-from app.recommender.embedding_texts import build_film_meta_text, build_review_text
+from app.db.repositories.embeddings import enqueue_embedding_jobs_bulk
+from app.recommender.embedding_texts import build_film_meta_texts, build_review_text
 from app.db.repositories.taste_profile import get_taste_profile
 
 
@@ -29,35 +29,37 @@ async def main():
             select(WatchedFilm).where(WatchedFilm.user_id == user.id).order_by(WatchedFilm.id.desc()).limit(args.limit)
         )).scalars().all()
 
-        count_jobs = 0
+        def job(source_type: str, source_id: int, text: str) -> dict:
+            return {
+                "user_id": user.id,
+                "source_type": source_type,
+                "source_id": source_id,
+                "content_text": text,
+                "model": settings.openai_embed_model,
+                "dimensions": settings.openai_embed_dimensions,
+            }
 
+        # film_meta (tmdb_id): тексты собираем пачкой
+        meta_texts = await build_film_meta_texts(session, [int(wf.tmdb_id) for wf in rows])
+
+        jobs: list[dict] = []
         for wf in rows:
-            # film_meta (tmdb_id)
-            meta_text = await build_film_meta_text(session, int(wf.tmdb_id))
+            meta_text = meta_texts.get(int(wf.tmdb_id), "")
             if meta_text.strip():
-                await enqueue_embedding_job(
-                    session, user.id, "film_meta", int(wf.tmdb_id), meta_text,
-                    settings.openai_embed_model, settings.openai_embed_dimensions
-                )
-                count_jobs += 1
+                jobs.append(job("film_meta", int(wf.tmdb_id), meta_text))
 
             # review (если есть rating или review)
             if wf.your_rating is not None or (wf.your_review and wf.your_review.strip()):
                 review_text = await build_review_text(wf.title, wf.year, float(wf.your_rating) if wf.your_rating is not None else None, wf.your_review)
                 if review_text.strip():
-                    await enqueue_embedding_job(
-                        session, user.id, "review", int(wf.id), review_text,
-                        settings.openai_embed_model, settings.openai_embed_dimensions
-                    )
-                    count_jobs += 1
+                    jobs.append(job("review", int(wf.id), review_text))
 
         profile = await get_taste_profile(session, user.id)
         if profile and profile.summary_text and profile.summary_text.strip():
-            await enqueue_embedding_job(
-                session, user.id, "profile", user.id, profile.summary_text.strip(),
-                settings.openai_embed_model, settings.openai_embed_dimensions
-            )
-            count_jobs += 1
+            jobs.append(job("profile", user.id, profile.summary_text.strip()))
+
+        # все job'ы одним INSERT
+        count_jobs = await enqueue_embedding_jobs_bulk(session, jobs)
 
         print(f"✅ Enqueued jobs: {count_jobs}")
 
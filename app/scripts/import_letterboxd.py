@@ -3,21 +3,32 @@ from __future__ import annotations
 import argparse
 import asyncio
 import csv
+import functools
+import heapq
+import itertools
 import json
+import os
 import re
 from dataclasses import dataclass
 from datetime import datetime, date
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Mapping, Optional, TextIO, TypeVar
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+try:
+    from rapidfuzz import fuzz  # опционально: C-реализация fuzzy-сравнения
+except ImportError:
+    fuzz = None
+
 from app.db.session import AsyncSessionLocal
 from app.db.models import User, WatchedFilm
 from app.integrations.tmdb import (
     search_movie,
-    get_movie_details,
+    get_movie_details_payloads,
+    movie_details_from_payload,
+    shared_http_client,
     MovieCandidate,
     TMDBError,
 )
@@ -28,19 +39,44 @@ from app.integrations.tmdb import (
 
 _HALF_SYMBOL = "½"
 
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y")
+
+
+# Символы, которые остаются в нормализованном заголовке (как в [^a-z0-9а-яё\s] с IGNORECASE)
+_TITLE_KEEP_RE = re.compile(r"[a-z0-9а-яё\s]", re.IGNORECASE)
+_TITLE_DROP_CHARS = "’'`"
+
+
+class _TitleTranslation(dict):
+    """
+    Таблица для str.translate, заполняется лениво по встреченным символам:
+    апострофы удаляем, разрешённые символы оставляем, остальное -> пробел.
+    """
+
+    def __missing__(self, code: int) -> Optional[str]:
+        ch = chr(code)
+        if ch in _TITLE_DROP_CHARS:
+            value = None
+        elif _TITLE_KEEP_RE.match(ch):
+            value = ch
+        else:
+            value = " "
+        self[code] = value
+        return value
+
+
+_TITLE_TRANSLATION = _TitleTranslation()
+
 
+@functools.lru_cache(maxsize=32768)
 def normalize_title(s: str) -> str:
     """
-    Нормализация заголовка для сравнения:
+    Нормализация заголовка для сравнения (чистая функция, кешируется):
     - lower
-    - убираем пунктуацию
+    - убираем пунктуацию (один проход str.translate)
     - схлопываем пробелы
     """
-    s = s.strip().lower()
-    s = re.sub(r"[’'`]", "", s)
-    s = re.sub(r"[^a-z0-9а-яё\s]", " ", s, flags=re.IGNORECASE)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return " ".join(s.lower().translate(_TITLE_TRANSLATION).split())
 
 
 def parse_year(value: Any) -> Optional[int]:
@@ -56,6 +92,13 @@ def parse_year(value: Any) -> Optional[int]:
     return None
 
 
+def _ymd(y: str, m: str, d: str) -> Optional[date]:
+    try:
+        return date(int(y), int(m), int(d))
+    except ValueError:
+        return None
+
+
 def parse_date(value: Any) -> Optional[date]:
     if value is None:
         return None
@@ -63,18 +106,28 @@ def parse_date(value: Any) -> Optional[date]:
     if not s:
         return None
 
-    # Частые форматы:
+    # Частые форматы разбираем по форме строки, без strptime и исключений:
     # 2024-01-31
-    # 31/01/2024
-    # 01/31/2024
+    # 31/01/2024 (или 01/31/2024, если первый вариант не дата)
     # 31.01.2024
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y"):
+    if len(s) == 10 and s.isascii():
+        sep = s[2]
+        if s[4] == "-" and s[7] == "-" and s[:4].isdigit() and s[5:7].isdigit() and s[8:].isdigit():
+            return _ymd(s[:4], s[5:7], s[8:])
+        if sep in "/." and s[5] == sep and s[:2].isdigit() and s[3:5].isdigit() and s[6:].isdigit():
+            d, m, y = s[:2], s[3:5], s[6:]
+            parsed = _ymd(y, m, d)
+            if parsed is None and sep == "/":
+                parsed = _ymd(y, d, m)
+            return parsed
+
+    # Остальные формы (без ведущих нулей, "2024-01-31 00:00:00" и т.п.) — прежним перебором
+    for fmt in _DATE_FORMATS:
         try:
             return datetime.strptime(s, fmt).date()
         except ValueError:
             pass
 
-    # Иногда бывает "2024-01-31 00:00:00"
     try:
         return datetime.fromisoformat(s).date()
     except ValueError:
@@ -115,22 +168,29 @@ def parse_rating(value: Any) -> Optional[float]:
     return None
 
 
-def pick_first(row: dict[str, Any], possible_keys: list[str]) -> Optional[str]:
+def resolve_column(fieldnames: Iterable[str], possible_keys: list[str]) -> Optional[str]:
     """
     Ищем колонку по нескольким вариантам названий (case-insensitive).
+    Делается один раз по заголовку CSV, а не на каждую строку.
     """
-    lower_map = {k.lower().strip(): k for k in row.keys()}
+    lower_map = {k.lower().strip(): k for k in fieldnames}
     for key in possible_keys:
         actual = lower_map.get(key.lower())
         if actual is not None:
-            val = row.get(actual)
-            if val is None:
-                return None
-            s = str(val).strip()
-            return s if s else None
+            return actual
     return None
 
 
+def cell(row: dict[str, Any], column: Optional[str]) -> Optional[str]:
+    if column is None:
+        return None
+    val = row.get(column)
+    if val is None:
+        return None
+    s = str(val).strip()
+    return s if s else None
+
+
 # ----------------------------
 # Candidate selection logic
 # ----------------------------
@@ -143,6 +203,18 @@ class SelectionResult:
     top_candidates: list[MovieCandidate]
 
 
+def partial_title_score(nt_want: str, nt_c: str) -> float:
+    """
+    Бонус за частичное совпадение нормализованных заголовков, 0..2.
+    С rapidfuzz — градуированный token_set_ratio (ниже 50 -> 0), иначе бинарная проверка подстроки.
+    """
+    if fuzz is not None:
+        return 0.02 * fuzz.token_set_ratio(nt_want, nt_c, score_cutoff=50)
+    if nt_want in nt_c or nt_c in nt_want:
+        return 2.0
+    return 0.0
+
+
 def score_candidate(c: MovieCandidate, want_title: str, want_year: Optional[int]) -> float:
     """
     Простая, но рабочая эвристика:
@@ -151,12 +223,13 @@ def score_candidate(c: MovieCandidate, want_title: str, want_year: Optional[int]
     - популярность/vote_average => маленький бонус (чтобы вытягивать очевидные варианты)
     """
     score = 0.0
-    if normalize_title(c.title) == normalize_title(want_title):
+    nt_want = normalize_title(want_title)
+    nt_c = normalize_title(c.title)
+    if nt_c == nt_want:
         score += 5.0
     else:
         # частичное совпадение
-        if normalize_title(want_title) in normalize_title(c.title) or normalize_title(c.title) in normalize_title(want_title):
-            score += 2.0
+        score += partial_title_score(nt_want, nt_c)
 
     if want_year is not None and c.year is not None:
         if c.year == want_year:
@@ -180,20 +253,23 @@ def choose_best_candidate(
     if not candidates:
         return SelectionResult(chosen=None, confidence=0.0, reason="no_candidates", top_candidates=[])
 
-    scored = [(c, score_candidate(c, want_title, want_year)) for c in candidates]
-    scored.sort(key=lambda x: x[1], reverse=True)
+    scored = ((c, score_candidate(c, want_title, want_year)) for c in candidates)
+    # Нужны только top-5: частичный отбор (стабилен так же, как sort по убыванию)
+    top = heapq.nlargest(5, scored, key=lambda x: x[1])
 
-    top_candidates = [c for c, _ in scored[:5]]
-    best, best_score = scored[0]
-    second_score = scored[1][1] if len(scored) > 1 else -999.0
+    top_candidates = [c for c, _ in top]
+    best, best_score = top[0]
+    second_score = top[1][1] if len(top) > 1 else -999.0
 
     # Уверенность: разница между первым и вторым + "насколько высокий" сам score
     margin = best_score - second_score
     confidence = 0.0
 
     # Если есть строгое совпадение title+year — почти всегда ок
+    nt_want = normalize_title(want_title)
+    nt_best = normalize_title(best.title)
     strict_match = (
-        normalize_title(best.title) == normalize_title(want_title)
+        nt_best == nt_want
         and (want_year is None or best.year == want_year)
     )
 
@@ -228,126 +304,251 @@ async def get_or_create_user(session: AsyncSession, telegram_id: int) -> User:
     return user
 
 
-async def watched_exists(session: AsyncSession, user_id: int, tmdb_id: int, watched_date: Optional[date]) -> bool:
+WatchedKey = tuple[int, Optional[date]]
+
+
+# Сколько WatchedFilm копим перед одним commit
+INSERT_BATCH_SIZE = 200
+
+
+async def load_watched_keys(session: AsyncSession, user_id: int) -> set[WatchedKey]:
     """
-    Дедуп на уровне кода:
-    - если есть запись с тем же user_id+tmdb_id и той же watched_date (или обе None)
+    Все (tmdb_id, watched_date) пользователя одним запросом — для дедупа импорта в памяти.
     """
-    stmt = select(WatchedFilm.id).where(
-        WatchedFilm.user_id == user_id,
-        WatchedFilm.tmdb_id == tmdb_id,
-    )
-    if watched_date is None:
-        stmt = stmt.where(WatchedFilm.watched_date.is_(None))
-    else:
-        stmt = stmt.where(WatchedFilm.watched_date == watched_date)
-
-    existing = (await session.execute(stmt)).scalar_one_or_none()
-    return existing is not None
+    rows = (
+        await session.execute(
+            select(WatchedFilm.tmdb_id, WatchedFilm.watched_date).where(WatchedFilm.user_id == user_id)
+        )
+    ).all()
+    return {(int(tmdb_id), watched_date) for tmdb_id, watched_date in rows}
 
 
-async def insert_watched(
-    session: AsyncSession,
-    user_id: int,
-    tmdb_id: int,
-    title: str,
-    year: Optional[int],
-    rating: Optional[float],
-    review: Optional[str],
-    watched_date: Optional[date],
-    source: str = "letterboxd",
-) -> None:
-    if await watched_exists(session, user_id, tmdb_id, watched_date):
+async def insert_watched_batch(session: AsyncSession, batch: list[WatchedFilm]) -> None:
+    if not batch:
         return
-
-    wf = WatchedFilm(
-        user_id=user_id,
-        tmdb_id=tmdb_id,
-        title=title,
-        year=year,
-        your_rating=rating,
-        your_review=review,
-        watched_date=watched_date,
-        source=source,
-    )
-    session.add(wf)
+    session.add_all(batch)
     await session.commit()
+    batch.clear()
 
 
 # ----------------------------
 # CSV Import
 # ----------------------------
 
-def extract_fields(row: dict[str, Any]) -> tuple[Optional[str], Optional[int], Optional[float], Optional[str], Optional[date]]:
+@dataclass(frozen=True)
+class CsvColumns:
     """
-    Пытаемся поддержать разные заголовки:
+    Фактические имена колонок CSV. Пытаемся поддержать разные заголовки:
     - title: Name / Film Name / Title
     - year: Year
     - rating: Rating
     - review: Review / Rewatch? (нет) / Comment
     - watched_date: Watched Date / Date / Diary Date
     """
-    title = pick_first(row, ["Name", "Film Name", "Title", "Film", "Movie", "Movie Title"])
-    year = parse_year(pick_first(row, ["Year", "Release Year"]))
-    rating = parse_rating(pick_first(row, ["Rating", "Your Rating", "Stars"]))
-    review = pick_first(row, ["Review", "Your Review", "Comment", "Notes", "Text"])
-    watched_date = parse_date(pick_first(row, ["Watched Date", "Date", "Diary Date", "Watched", "Watched On"]))
+
+    title: Optional[str]
+    year: Optional[str]
+    rating: Optional[str]
+    review: Optional[str]
+    watched_date: Optional[str]
+
+    @classmethod
+    def from_fieldnames(cls, fieldnames: Iterable[str]) -> CsvColumns:
+        fieldnames = list(fieldnames)
+        return cls(
+            title=resolve_column(fieldnames, ["Name", "Film Name", "Title", "Film", "Movie", "Movie Title"]),
+            year=resolve_column(fieldnames, ["Year", "Release Year"]),
+            rating=resolve_column(fieldnames, ["Rating", "Your Rating", "Stars"]),
+            review=resolve_column(fieldnames, ["Review", "Your Review", "Comment", "Notes", "Text"]),
+            watched_date=resolve_column(fieldnames, ["Watched Date", "Date", "Diary Date", "Watched", "Watched On"]),
+        )
+
+
+def extract_fields(
+    row: dict[str, Any],
+    columns: CsvColumns,
+) -> tuple[Optional[str], Optional[int], Optional[float], Optional[str], Optional[date]]:
+    title = cell(row, columns.title)
+    year = parse_year(cell(row, columns.year))
+    rating = parse_rating(cell(row, columns.rating))
+    review = cell(row, columns.review)
+    watched_date = parse_date(cell(row, columns.watched_date))
     return title, year, rating, review, watched_date
 
 
-def write_unresolved_header(path: Path) -> None:
-    if path.exists():
-        return
-    with path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=[
-                "row_index",
-                "title",
-                "year",
-                "watched_date",
-                "rating",
-                "review",
-                "reason",
-                "candidates_json",
-                "chosen_tmdb_id",
-            ],
-        )
-        w.writeheader()
+UNRESOLVED_FIELDS = [
+    "row_index",
+    "title",
+    "year",
+    "watched_date",
+    "rating",
+    "review",
+    "reason",
+    "candidates_json",
+    "chosen_tmdb_id",
+]
+
+
+class UnresolvedWriter:
+    """
+    Дозапись unresolved строк через один открытый файл на весь импорт.
+    Файл открывается при первой записи, заголовок пишется только в пустой файл.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._fh: Optional[TextIO] = None
+        self._writer: Optional[csv.DictWriter] = None
+
+    def write(self, record: dict[str, Any]) -> None:
+        if self._writer is None:
+            self._fh = self.path.open("a", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._fh, fieldnames=UNRESOLVED_FIELDS)
+            if os.fstat(self._fh.fileno()).st_size == 0:
+                self._writer.writeheader()
+        self._writer.writerow(record)
 
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            self._writer = None
 
-def append_unresolved(path: Path, record: dict[str, Any]) -> None:
-    write_unresolved_header(path)
-    with path.open("a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=list(record.keys()))
-        w.writerow(record)
 
+SearchKey = tuple[str, Optional[int]]
 
-def load_overrides(path: Optional[Path]) -> dict[tuple[str, Optional[int]], int]:
+
+def search_key(title: str, year: Optional[int]) -> SearchKey:
+    """
+    Ключ поиска/overrides: нормализованный title + year.
+    Заголовки из одной пунктуации не схлопываем в общий пустой ключ.
+    """
+    return normalize_title(title) or title, year
+
+
+def load_overrides(path: Optional[Path]) -> Mapping[SearchKey, int]:
     """
     overrides CSV формат:
     title,year,tmdb_id
+
+    Результат кешируется по (путь, mtime), повторные импорты не перечитывают файл.
+    Возвращаемый словарь общий — только для чтения.
     """
     if path is None or not path.exists():
         return {}
+    return _load_overrides_cached(str(path), path.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_overrides_cached(path: str, mtime_ns: int) -> dict[SearchKey, int]:
+    mapping: dict[SearchKey, int] = {}
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        r = csv.reader(f)
+        header = next(r, None)
+        if header is None:
+            return mapping
+        # Как DictReader: при дублях колонок берётся последняя
+        idx = {name: i for i, name in enumerate(header)}
+        i_title, i_year, i_tmdb = idx.get("title"), idx.get("year"), idx.get("tmdb_id")
+        if i_title is None or i_tmdb is None:
+            return mapping
 
-    mapping: dict[tuple[str, Optional[int]], int] = {}
-    with path.open("r", newline="", encoding="utf-8") as f:
-        r = csv.DictReader(f)
         for row in r:
-            t = (row.get("title") or "").strip()
-            y = parse_year(row.get("year"))
-            tmdb = row.get("tmdb_id")
+            n = len(row)
+            t = row[i_title].strip() if i_title < n else ""
+            tmdb = row[i_tmdb] if i_tmdb < n else ""
             if not t or not tmdb:
                 continue
             try:
                 tmdb_id = int(tmdb)
             except ValueError:
                 continue
-            mapping[(normalize_title(t), y)] = tmdb_id
+            y = parse_year(row[i_year]) if i_year is not None and i_year < n else None
+            mapping[search_key(t, y)] = tmdb_id
     return mapping
 
 
+async def search_many(
+    queries: dict[SearchKey, str],
+    concurrency: int,
+    sleep_s: float,
+) -> dict[SearchKey, list[MovieCandidate] | TMDBError]:
+    """
+    Параллельный поиск в TMDB: по одному запросу на ключ (queries: ключ -> исходный title).
+    Семафор ограничивает число одновременных запросов, пауза держит слот занятым,
+    чтобы не упереться в лимиты TMDB. Ошибка TMDB сохраняется как значение.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(key: SearchKey) -> tuple[SearchKey, list[MovieCandidate] | TMDBError]:
+        async with sem:
+            try:
+                result: list[MovieCandidate] | TMDBError = await search_movie(query=queries[key], year=key[1])
+            except TMDBError as e:
+                result = e
+            if sleep_s > 0:
+                await asyncio.sleep(sleep_s)
+        return key, result
+
+    if not queries:
+        return {}
+    async with shared_http_client():
+        return dict(await asyncio.gather(*(fetch(k) for k in queries)))
+
+
+IMPORT_CHUNK_SIZE = 500
+
+T = TypeVar("T")
+
+
+def iter_chunks(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Окна фиксированного размера поверх итератора (последнее — меньше)."""
+    it = iter(items)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+def resolve_row(
+    title: str,
+    year: Optional[int],
+    overrides: Mapping[SearchKey, int],
+    search_results: dict[SearchKey, list[MovieCandidate] | TMDBError],
+) -> SelectionResult:
+    key = search_key(title, year)
+
+    # 1) Overrides (ручная карта) — абсолютный приоритет
+    if key in overrides:
+        return SelectionResult(MovieCandidate(tmdb_id=overrides[key], title=title, year=year), 1.0, "override", [])
+
+    # 2) TMDB search (уже выполнен в search_many)
+    candidates = search_results[key]
+    if isinstance(candidates, TMDBError):
+        return SelectionResult(None, 0.0, f"tmdb_error:{str(candidates)}", [])
+    return choose_best_candidate(candidates, title, year)
+
+
+def unresolved_record(
+    idx: int,
+    title: str,
+    year: Optional[int],
+    rating: Optional[float],
+    review: Optional[str],
+    watched_date: Optional[date],
+    sel: SelectionResult,
+) -> dict[str, Any]:
+    return {
+        "row_index": idx,
+        "title": title,
+        "year": year or "",
+        "watched_date": watched_date.isoformat() if watched_date else "",
+        "rating": rating if rating is not None else "",
+        "review": (review or "")[:2000],
+        "reason": sel.reason,
+        "candidates_json": json.dumps([c.__dict__ for c in sel.top_candidates], ensure_ascii=False),
+        "chosen_tmdb_id": "",
+    }
+
+
 async def import_csv(
     csv_path: Path,
     telegram_id: int,
@@ -356,123 +557,107 @@ async def import_csv(
     limit: Optional[int],
     sleep_s: float,
     dry_run: bool,
+    concurrency: int = 8,
 ) -> None:
     overrides = load_overrides(overrides_path)
 
-    async with AsyncSessionLocal() as session:
-        user = await get_or_create_user(session, telegram_id)
-        user_id = user.id
-
-    # Кеш поиска, чтобы не бомбить TMDB одинаковыми запросами
-    search_cache: dict[tuple[str, Optional[int]], list[MovieCandidate]] = {}
+    # Кеш поиска на весь импорт, чтобы не бомбить TMDB одинаковыми запросами
+    search_results: dict[SearchKey, list[MovieCandidate] | TMDBError] = {}
 
     imported = 0
     unresolved = 0
     processed = 0
+    unresolved_writer = UnresolvedWriter(unresolved_out)
 
-    with csv_path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-
-        for idx, row in enumerate(reader, start=1):
-            if limit is not None and processed >= limit:
-                break
-            processed += 1
-
-            title, year, rating, review, watched_date = extract_fields(row)
+    # Одна сессия на весь импорт: пользователь, preload, details и вставки пачками
+    async with AsyncSessionLocal() as session:
+        user = await get_or_create_user(session, telegram_id)
+        user_id = user.id
+        existing: set[WatchedKey] = set() if dry_run else await load_watched_keys(session, user_id)
+        batch: list[WatchedFilm] = []
 
-            if not title:
-                # Нечего импортировать
-                continue
+        with csv_path.open("r", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            columns = CsvColumns.from_fieldnames(reader.fieldnames or [])
+            rows: Iterable[dict[str, Any]] = itertools.islice(reader, limit) if limit is not None else reader
 
-            # 1) Overrides (ручная карта) — абсолютный приоритет
-            override_key = (normalize_title(title), year)
-            if override_key in overrides:
-                chosen_tmdb_id = overrides[override_key]
-                confidence = 1.0
-                reason = "override"
-                top_candidates = []
-            else:
-                # 2) TMDB search
-                cache_key = (title, year)
-                if cache_key in search_cache:
-                    candidates = search_cache[cache_key]
-                else:
-                    try:
-                        candidates = await search_movie(query=title, year=year)
-                    except TMDBError as e:
-                        append_unresolved(
-                            unresolved_out,
-                            {
-                                "row_index": idx,
-                                "title": title,
-                                "year": year or "",
-                                "watched_date": watched_date.isoformat() if watched_date else "",
-                                "rating": rating if rating is not None else "",
-                                "review": (review or "")[:2000],
-                                "reason": f"tmdb_error:{str(e)}",
-                                "candidates_json": "[]",
-                                "chosen_tmdb_id": "",
-                            },
-                        )
-                        unresolved += 1
+            try:
+                # Файл читаем окнами: память не растёт с размером дневника,
+                # а поиски внутри окна идут параллельно
+                for chunk in iter_chunks(enumerate(rows, start=1), IMPORT_CHUNK_SIZE):
+                    parsed = [(idx, *extract_fields(row, columns)) for idx, row in chunk]
+                    processed += len(parsed)
+
+                    # Новые уникальные поиски окна (кроме overrides). Ключ нормализован,
+                    # так что "Alien" и "alien " ищутся один раз.
+                    search_queries: dict[SearchKey, str] = {}
+                    for _, title, year, *_ in parsed:
+                        if title:
+                            key = search_key(title, year)
+                            if key not in overrides and key not in search_results:
+                                search_queries.setdefault(key, title)
+                    search_results.update(await search_many(search_queries, concurrency=concurrency, sleep_s=sleep_s))
+
+                    resolved: list[tuple[int, str, Optional[int], Optional[float], Optional[str], Optional[date]]] = []
+                    for idx, title, year, rating, review, watched_date in parsed:
+                        if not title:
+                            # Нечего импортировать
+                            continue
+
+                        sel = resolve_row(title, year, overrides, search_results)
+                        if sel.chosen is None:
+                            unresolved_writer.write(unresolved_record(idx, title, year, rating, review, watched_date, sel))
+                            unresolved += 1
+                            continue
+
+                        if dry_run:
+                            print(
+                                f"[DRY RUN] row={idx} -> tmdb_id={sel.chosen.tmdb_id} title='{title}' year={year} "
+                                f"conf={sel.confidence:.2f} reason={sel.reason}"
+                            )
+                            imported += 1
+                            continue
+
+                        resolved.append((sel.chosen.tmdb_id, title, year, rating, review, watched_date))
+
+                    if not resolved:
                         continue
 
-                    search_cache[cache_key] = candidates
-
-                sel = choose_best_candidate(candidates, title, year)
-                if sel.chosen is None:
-                    append_unresolved(
-                        unresolved_out,
-                        {
-                            "row_index": idx,
-                            "title": title,
-                            "year": year or "",
-                            "watched_date": watched_date.isoformat() if watched_date else "",
-                            "rating": rating if rating is not None else "",
-                            "review": (review or "")[:2000],
-                            "reason": sel.reason,
-                            "candidates_json": json.dumps([c.__dict__ for c in sel.top_candidates], ensure_ascii=False),
-                            "chosen_tmdb_id": "",
-                        },
-                    )
-                    unresolved += 1
-                    continue
-
-                chosen_tmdb_id = sel.chosen.tmdb_id
-                confidence = sel.confidence
-                reason = sel.reason
-                top_candidates = sel.top_candidates
-
-            # 3) Подтянуть канонические details (кешируется таблицей из этапа 3)
-            if dry_run:
-                print(f"[DRY RUN] row={idx} -> tmdb_id={chosen_tmdb_id} title='{title}' year={year} conf={confidence:.2f} reason={reason}")
-                imported += 1
-                continue
-
-            async with AsyncSessionLocal() as session:
-                details = await get_movie_details(session, chosen_tmdb_id)
-
-                # 4) Insert watched film (dedupe)
-                await insert_watched(
-                    session=session,
-                    user_id=user_id,
-                    tmdb_id=chosen_tmdb_id,
-                    title=details.title or title,
-                    year=details.year or year,
-                    rating=rating,
-                    review=review,
-                    watched_date=watched_date,
-                    source="letterboxd",
-                )
-
-            imported += 1
-
-            # 5) Небольшая пауза, чтобы не упереться в лимиты TMDB
-            if sleep_s > 0:
-                await asyncio.sleep(sleep_s)
-
-            if imported % 50 == 0:
-                print(f"Progress: processed={processed}, imported={imported}, unresolved={unresolved}")
+                    # 3) Канонические details всего окна: один SELECT по кешу, промахи — параллельно в TMDB
+                    async with shared_http_client():
+                        details_payloads = await get_movie_details_payloads(session, [r[0] for r in resolved])
+
+                    for chosen_tmdb_id, title, year, rating, review, watched_date in resolved:
+                        payload = details_payloads.get(chosen_tmdb_id)
+                        details = movie_details_from_payload(chosen_tmdb_id, payload) if payload is not None else None
+
+                        # 4) Insert watched film (дедуп по preload-набору, запись пачками)
+                        watched_key = (chosen_tmdb_id, watched_date)
+                        if watched_key not in existing:
+                            existing.add(watched_key)
+                            batch.append(
+                                WatchedFilm(
+                                    user_id=user_id,
+                                    tmdb_id=chosen_tmdb_id,
+                                    title=(details.title if details else None) or title,
+                                    year=(details.year if details else None) or year,
+                                    your_rating=rating,
+                                    your_review=review,
+                                    watched_date=watched_date,
+                                    source="letterboxd",
+                                )
+                            )
+                            if len(batch) >= INSERT_BATCH_SIZE:
+                                await insert_watched_batch(session, batch)
+
+                        imported += 1
+
+                        if imported % 50 == 0:
+                            print(f"Progress: processed={processed}, imported={imported}, unresolved={unresolved}")
+
+                await insert_watched_batch(session, batch)
+            finally:
+                unresolved_writer.close()
 
     print("\n=== Import finished ===")
     print(f"Processed:  {processed}")
@@ -489,7 +674,8 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--unresolved-out", default="unresolved.csv", help="Where to save unresolved rows")
     p.add_argument("--overrides", default=None, help="Optional overrides CSV: title,year,tmdb_id")
     p.add_argument("--limit", type=int, default=None, help="Limit rows for testing")
-    p.add_argument("--sleep", type=float, default=0.15, help="Sleep between TMDB calls (seconds)")
+    p.add_argument("--sleep", type=float, default=0.15, help="Pause after each TMDB search, per worker (seconds)")
+    p.add_argument("--concurrency", type=int, default=8, help="Parallel TMDB searches")
     p.add_argument("--dry-run", action="store_true", help="Do not write to DB, only print what would happen")
     return p.parse_args()
 
@@ -511,6 +697,7 @@ async def main() -> None:
         limit=args.limit,
         sleep_s=args.sleep,
         dry_run=args.dry_run,
+        concurrency=args.concurrency,
     )
 
 
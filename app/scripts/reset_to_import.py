@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+from typing import Any
 
-from sqlalchemy import select, delete
+from sqlalchemy import Select, delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import AsyncSessionLocal
@@ -19,6 +20,10 @@ from app.db.models import (
 from app.recommender.taste_profile_v0 import update_taste_profile_v0
 
 
+# watched_films, созданные ботом/вручную (letterboxd-импорт остаётся)
+RESET_SOURCES = ("agent", "manual")
+
+
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Reset user data to 'after Letterboxd import' state.")
     p.add_argument("--telegram-id", required=True, type=int, help="Your Telegram numeric id")
@@ -33,97 +38,106 @@ async def get_user(session: AsyncSession, telegram_id: int) -> User:
     return user
 
 
+def _count(sel) -> Any:
+    return select(func.count()).select_from(sel.subquery()).scalar_subquery()
+
+
+def _plan_stmt(user_id: int) -> Select:
+    """
+    Dry-run: все счётчики плана одним запросом (только чтение).
+    """
+    rec_ids = select(AgentRecommendation.id).where(AgentRecommendation.user_id == user_id)
+    item_ids = select(AgentRecommendationItem.id).where(AgentRecommendationItem.recommendation_id.in_(rec_ids))
+    return select(
+        _count(rec_ids),
+        _count(item_ids),
+        _count(select(Feedback.id).where(Feedback.recommendation_item_id.in_(item_ids))),
+        _count(select(WatchedFilm.id).where(WatchedFilm.user_id == user_id, WatchedFilm.source.in_(RESET_SOURCES))),
+        _count(select(PendingAction.user_id).where(PendingAction.user_id == user_id)),
+        _count(select(TasteProfile.user_id).where(TasteProfile.user_id == user_id)),
+    )
+
+
+def _reset_stmt(user_id: int) -> Select:
+    """
+    Все удаления одним SQL-выражением (writable CTE, PostgreSQL), счётчики — из RETURNING.
+    feedback -> items -> recommendations связаны через RETURNING id, FK проверяются в конце выражения.
+    """
+    d_rec = (
+        delete(AgentRecommendation)
+        .where(AgentRecommendation.user_id == user_id)
+        .returning(AgentRecommendation.id)
+        .cte("d_rec")
+    )
+    d_item = (
+        delete(AgentRecommendationItem)
+        .where(AgentRecommendationItem.recommendation_id.in_(select(d_rec.c.id)))
+        .returning(AgentRecommendationItem.id)
+        .cte("d_item")
+    )
+    d_fb = (
+        delete(Feedback)
+        .where(Feedback.recommendation_item_id.in_(select(d_item.c.id)))
+        .returning(Feedback.id)
+        .cte("d_fb")
+    )
+    d_watched = (
+        delete(WatchedFilm)
+        .where(WatchedFilm.user_id == user_id, WatchedFilm.source.in_(RESET_SOURCES))
+        .returning(WatchedFilm.id)
+        .cte("d_watched")
+    )
+    d_pending = (
+        delete(PendingAction)
+        .where(PendingAction.user_id == user_id)
+        .returning(PendingAction.user_id)
+        .cte("d_pending")
+    )
+    d_profile = (
+        delete(TasteProfile)
+        .where(TasteProfile.user_id == user_id)
+        .returning(TasteProfile.user_id)
+        .cte("d_profile")
+    )
+    return select(
+        *(
+            select(func.count()).select_from(cte).scalar_subquery()
+            for cte in (d_rec, d_item, d_fb, d_watched, d_pending, d_profile)
+        )
+    )
+
+
+def print_plan(user_id: int, counts: tuple[int, ...]) -> None:
+    recs, items, feedback, watched, pending, profile = counts
+    print("=== RESET PLAN ===")
+    print(f"User id: {user_id}")
+    print(f"Agent recommendations: {recs}")
+    print(f"Recommendation items: {items}")
+    print(f"Feedback rows: {feedback}")
+    print(f"Watched rows to delete (source=agent/manual): {watched}")
+    print(f"Pending action exists: {pending > 0}")
+    print(f"Taste profile exists: {profile > 0}")
+
+
 async def main() -> None:
     args = parse_args()
 
     async with AsyncSessionLocal() as session:
         user = await get_user(session, args.telegram_id)
-
-        # ---- Count what will be affected
-        # Recommendations
-        rec_ids = (await session.execute(
-            select(AgentRecommendation.id).where(AgentRecommendation.user_id == user.id)
-        )).scalars().all()
-        rec_ids = [int(x) for x in rec_ids]
-
-        items_count = 0
-        feedback_count = 0
-        if rec_ids:
-            item_ids = (await session.execute(
-                select(AgentRecommendationItem.id).where(AgentRecommendationItem.recommendation_id.in_(rec_ids))
-            )).scalars().all()
-            item_ids = [int(x) for x in item_ids]
-            items_count = len(item_ids)
-
-            if item_ids:
-                feedback_count = (await session.execute(
-                    select(Feedback.id).where(Feedback.recommendation_item_id.in_(item_ids))
-                )).scalars().all()
-                feedback_count = len(feedback_count)
-
-        # Watched to delete (agent/manual)
-        watched_to_delete = (await session.execute(
-            select(WatchedFilm.id).where(
-                WatchedFilm.user_id == user.id,
-                WatchedFilm.source.in_(("agent", "manual")),
-            )
-        )).scalars().all()
-        watched_del_count = len(watched_to_delete)
-
-        pending_exists = (await session.execute(
-            select(PendingAction.user_id).where(PendingAction.user_id == user.id)
-        )).scalar_one_or_none() is not None
-
-        profile_exists = (await session.execute(
-            select(TasteProfile.user_id).where(TasteProfile.user_id == user.id)
-        )).scalar_one_or_none() is not None
-
-        print("=== RESET PLAN ===")
-        print(f"User id: {user.id}")
-        print(f"Agent recommendations: {len(rec_ids)}")
-        print(f"Recommendation items: {items_count}")
-        print(f"Feedback rows: {feedback_count}")
-        print(f"Watched rows to delete (source=agent/manual): {watched_del_count}")
-        print(f"Pending action exists: {pending_exists}")
-        print(f"Taste profile exists: {profile_exists}")
+        user_id = user.id
 
         if args.dry_run:
+            counts = tuple((await session.execute(_plan_stmt(user_id))).one())
+            print_plan(user_id, counts)
             print("\nDry-run only. No changes made.")
             return
 
-        # ---- Delete in FK-safe order:
-        # feedback -> items -> recommendations
-        if rec_ids:
-            # delete feedback by join via items
-            item_ids = (await session.execute(
-                select(AgentRecommendationItem.id).where(AgentRecommendationItem.recommendation_id.in_(rec_ids))
-            )).scalars().all()
-            item_ids = [int(x) for x in item_ids]
-
-            if item_ids:
-                await session.execute(delete(Feedback).where(Feedback.recommendation_item_id.in_(item_ids)))
-                await session.execute(delete(AgentRecommendationItem).where(AgentRecommendationItem.id.in_(item_ids)))
-
-            await session.execute(delete(AgentRecommendation).where(AgentRecommendation.id.in_(rec_ids)))
-
-        # delete pending actions
-        await session.execute(delete(PendingAction).where(PendingAction.user_id == user.id))
-
-        # delete taste profile (we will rebuild)
-        await session.execute(delete(TasteProfile).where(TasteProfile.user_id == user.id))
-
-        # delete watched films created by bot/manual
-        await session.execute(
-            delete(WatchedFilm).where(
-                WatchedFilm.user_id == user.id,
-                WatchedFilm.source.in_(("agent", "manual")),
-            )
-        )
-
+        counts = tuple((await session.execute(_reset_stmt(user_id))).one())
         await session.commit()
+        print_plan(user_id, counts)
 
         # Recompute taste profile ONLY from letterboxd
-        await update_taste_profile_v0(session=session, user_id=user.id, sources=("letterboxd",))
+        await update_taste_profile_v0(session=session, user_id=user_id, sources=("letterboxd",))
         print("\n✅ Reset done. Taste profile rebuilt from Letterboxd only.")
 
 
@@ -5,8 +5,8 @@ import asyncio
 
 from sqlalchemy import select
 from app.db.session import AsyncSessionLocal
-from app.db.models import User, WatchedFilm, TextEmbedding
-from app.integrations.tmdb import get_movie_details
+from app.db.models import User, WatchedFilm, TextEmbedding, TmdbMovieDetailsCache
+from app.integrations.tmdb import get_movie_details, get_movie_details_payloads, movie_details_from_payload
 from pgvector.sqlalchemy import avg
 
 
@@ -51,10 +51,11 @@ async def main():
 
         q = fav_emb.embedding  # list[float]
 
-        # 2) ищем похожие film_meta (исключая сам фильм)
+        # 2) ищем похожие film_meta (исключая сам фильм); title/year — из кеша details тем же запросом
         dist = TextEmbedding.embedding.cosine_distance(q)
         rows = (await session.execute(
-            select(TextEmbedding.source_id, dist.label("dist"))
+            select(TextEmbedding.source_id, dist.label("dist"), TmdbMovieDetailsCache.payload)
+            .outerjoin(TmdbMovieDetailsCache, TmdbMovieDetailsCache.tmdb_id == TextEmbedding.source_id)
             .where(TextEmbedding.user_id == user.id)
             .where(TextEmbedding.source_type == "film_meta")
             .where(TextEmbedding.source_id != fav_tmdb_id)
@@ -62,14 +63,18 @@ async def main():
             .limit(args.limit)
         )).all()
 
+        # Кого нет в кеше — догружаем одной пачкой
+        missing = [int(tmdb_id) for tmdb_id, _, payload in rows if payload is None]
+        fetched = await get_movie_details_payloads(session, missing) if missing else {}
+
         fav_details = await get_movie_details(session, fav_tmdb_id)
         print(f"\nFavorite: {fav_details.title} ({fav_details.year})\n")
 
-        for tmdb_id, d in rows:
-            details = await get_movie_details(session, int(tmdb_id))
+        for tmdb_id, d, payload in rows:
+            tmdb_id = int(tmdb_id)
+            details = movie_details_from_payload(tmdb_id, payload if payload is not None else fetched.get(tmdb_id, {}))
             similarity = 1.0 - float(d)  # cosine distance -> similarity
             print(f"{similarity:.3f}  {details.title} ({details.year})")
 
-
 if __name__ == "__main__":
     asyncio.run(main())
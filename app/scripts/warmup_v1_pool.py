@@ -8,9 +8,28 @@ from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.db.models import User
 from app.db.repositories.recs_sources import get_top_rated_tmdb_ids, get_watched_tmdb_ids
-from app.integrations.tmdb import get_similar, get_recommendations
-from app.recommender.embedding_texts import build_film_meta_text
-from app.db.repositories.embeddings import enqueue_embedding_job
+from app.integrations.tmdb import MovieCandidate, get_similar, get_recommendations, shared_http_client
+from app.recommender.embedding_texts import build_film_meta_texts
+from app.db.repositories.embeddings import enqueue_embedding_jobs_bulk
+
+
+ENQUEUE_BATCH_SIZE = 500
+
+
+async def fetch_seed_lists(seeds: list[int], concurrency: int = 8) -> list[list[MovieCandidate]]:
+    """
+    similar + recommendations по всем seed'ам параллельно (семафор на seed, общий httpx-клиент).
+    Порядок результата совпадает с порядком seeds.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def both(s: int) -> list[MovieCandidate]:
+        async with sem:
+            sim, rec = await asyncio.gather(get_similar(s, page=1), get_recommendations(s, page=1))
+        return (sim or []) + (rec or [])
+
+    async with shared_http_client():
+        return await asyncio.gather(*(both(s) for s in seeds))
 
 
 def parse_args():
@@ -31,10 +50,8 @@ async def main():
         watched = await get_watched_tmdb_ids(session, user.id)
 
         pool: dict[int, float] = {}  # tmdb_id -> quality heuristic
-        for s in seeds:
-            sim = await get_similar(s, page=1)
-            rec = await get_recommendations(s, page=1)
-            for c in (sim or []) + (rec or []):
+        for candidates in await fetch_seed_lists(seeds):
+            for c in candidates:
                 if c.tmdb_id in watched:
                     continue
                 q = float(c.vote_average or 0) + float(c.popularity or 0) / 100.0
@@ -43,21 +60,30 @@ async def main():
         cand_ids = [tid for tid, _ in sorted(pool.items(), key=lambda kv: kv[1], reverse=True)]
         cand_ids = cand_ids[: args.limit]
 
-        enq = 0
+        # Тексты всех кандидатов пачкой: кеш details/keywords одним запросом, промахи — параллельно в TMDB
+        async with shared_http_client():
+            texts = await build_film_meta_texts(session, cand_ids)
+
+        jobs: list[dict] = []
         for tid in cand_ids:
-            text = await build_film_meta_text(session, tid)
+            text = texts.get(tid, "")
             if not text.strip():
                 continue
-            await enqueue_embedding_job(
-                session=session,
-                user_id=user.id,
-                source_type="film_meta",
-                source_id=tid,
-                content_text=text,
-                model=settings.openai_embed_model,
-                dimensions=settings.openai_embed_dimensions,
+            jobs.append(
+                {
+                    "user_id": user.id,
+                    "source_type": "film_meta",
+                    "source_id": tid,
+                    "content_text": text,
+                    "model": settings.openai_embed_model,
+                    "dimensions": settings.openai_embed_dimensions,
+                }
             )
-            enq += 1
+
+        # Один INSERT ... ON CONFLICT на пачку вместо запроса и commit на каждый job
+        enq = 0
+        for i in range(0, len(jobs), ENQUEUE_BATCH_SIZE):
+            enq += await enqueue_embedding_jobs_bulk(session, jobs[i : i + ENQUEUE_BATCH_SIZE])
 
         print(f"✅ Enqueued film_meta jobs for candidates: {enq}")
 
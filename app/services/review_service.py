@@ -1,23 +1,116 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from datetime import datetime
+from functools import lru_cache, partial
 from zoneinfo import ZoneInfo
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db.repositories.recommendations import set_item_status, upsert_feedback
+from app.core.config import settings
+from app.db.repositories.embeddings import enqueue_embedding_job
+from app.db.repositories.recommendations import upsert_feedback_and_mark_watched
+from app.db.repositories.taste_profile import get_taste_profile
 from app.db.repositories.watched import upsert_watched
-from app.integrations.tmdb import get_movie_details
+from app.integrations.tmdb import get_movie_details_cached, get_movie_details_overlapped
 from app.recommender.taste_profile_v0 import update_taste_profile_v0
 
+logger = logging.getLogger(__name__)
+
+# Фоновые пересчёты профиля: не больше одной задачи на пользователя (ссылки держим,
+# иначе задачу может собрать GC); запросы, пришедшие во время неё, только ставят флаг
+PROFILE_DEBOUNCE_SECONDS = 0.5
+_profile_tasks: dict[int, asyncio.Task] = {}
+_profile_dirty: set[int] = set()
+
+
+@lru_cache(maxsize=512)
+def _zone(tz: str) -> ZoneInfo:
+    # невалидные tz не кешируются (исключение пробрасывается как раньше)
+    return ZoneInfo(tz)
+
 
 def _today_in_tz(tz: str) -> datetime.date:
     try:
-        return datetime.now(ZoneInfo(tz)).date()
+        return datetime.now(_zone(tz)).date()
     except Exception:
         return datetime.utcnow().date()
 
 
+async def _refresh_taste_profile(session: AsyncSession, user_id: int) -> None:
+    """
+    Пересчёт профиля + то, что от него зависит:
+    раз в N отзывов summary через LLM и job на эмбеддинг профиля.
+    """
+    await update_taste_profile_v0(session=session, user_id=user_id)
+
+    # раз в N отзывов красиво переписать summary (если модуль есть)
+    try:
+        from app.llm.summary_refresh import maybe_refresh_summary_text
+        await maybe_refresh_summary_text(session=session, user_id=user_id, every_n=10)
+    except Exception:
+        pass
+
+    profile = await get_taste_profile(session, user_id)
+    if profile and profile.summary_text and profile.summary_text.strip():
+        await enqueue_embedding_job(
+            session=session,
+            user_id=user_id,
+            source_type="profile",
+            source_id=int(user_id),
+            content_text=profile.summary_text.strip(),
+            model=settings.openai_embed_model,
+            dimensions=settings.openai_embed_dimensions,
+        )
+
+
+async def _recompute_taste_profile(
+    session_factory: async_sessionmaker[AsyncSession],
+    user_id: int,
+    delay: float,
+) -> None:
+    # ждём, пока пачка отзывов подряд долетит, и считаем профиль один раз на всю пачку;
+    # если за время пересчёта пришли новые — считаем ещё раз
+    await asyncio.sleep(delay)
+    while user_id in _profile_dirty:
+        _profile_dirty.discard(user_id)
+        # своя сессия: AsyncSession нельзя делить между задачами
+        async with session_factory() as session:
+            await _refresh_taste_profile(session, user_id)
+
+
+def _on_profile_task_done(user_id: int, task: asyncio.Task) -> None:
+    if _profile_tasks.get(user_id) is task:
+        del _profile_tasks[user_id]
+    if not task.cancelled() and task.exception() is not None:
+        # флаг не оставляем: следующий отзыв запустит пересчёт заново
+        _profile_dirty.discard(user_id)
+        logger.error("Background taste profile update failed", exc_info=task.exception())
+
+
+def schedule_taste_profile_update(
+    session_factory: async_sessionmaker[AsyncSession],
+    user_id: int,
+    delay: float | None = None,
+) -> asyncio.Task:
+    """
+    Пересчёт профиля вкуса в фоне: нужен только следующей рекомендации, не текущему ответу.
+    Если для пользователя задача уже есть, новая не создаётся — текущая подхватит изменения.
+    """
+    _profile_dirty.add(user_id)
+    task = _profile_tasks.get(user_id)
+    if task is not None and not task.done():
+        return task
+
+    if delay is None:
+        delay = PROFILE_DEBOUNCE_SECONDS
+    task = asyncio.create_task(_recompute_taste_profile(session_factory, user_id, delay))
+    _profile_tasks[user_id] = task
+    task.add_done_callback(partial(_on_profile_task_done, user_id))
+    return task
+
+
 async def save_review(
     session: AsyncSession,
     *,
@@ -28,19 +121,27 @@ async def save_review(
     review_text: str | None,
     mode: str,  # "agent" | "manual"
     recommendation_item_id: int | None = None,
+    session_factory: async_sessionmaker[AsyncSession] | None = None,
 ) -> int:
     """
     Возвращает watched_film_id.
-    Делает все нужные записи + пересчет профиля вкуса.
+    Делает все нужные записи + пересчет профиля вкуса (с summary и эмбеддингом профиля).
+    С session_factory пересчёт уходит в фоновую задачу со своей сессией,
+    без него — выполняется здесь же, в session (как раньше).
     """
-    details = await get_movie_details(session, tmdb_id)
     watched_date = _today_in_tz(user_timezone)
 
     if mode == "agent" and recommendation_item_id is not None:
-        await upsert_feedback(session, recommendation_item_id=recommendation_item_id, rating=rating, review=review_text)
-        await set_item_status(session, recommendation_item_id, "watched")
+        item_id = recommendation_item_id
+
+        async def agent_writes() -> None:
+            await upsert_feedback_and_mark_watched(session, recommendation_item_id=item_id, rating=rating, review=review_text)
+
+        # feedback/status не зависят от details: пишем их, пока TMDB отвечает
+        details = await get_movie_details_overlapped(session, tmdb_id, agent_writes)
         source = "agent"
     else:
+        details = await get_movie_details_cached(session, tmdb_id)
         source = "manual"
 
     watched_id = await upsert_watched(
@@ -55,5 +156,8 @@ async def save_review(
         source=source,
     )
 
-    await update_taste_profile_v0(session=session, user_id=user_id)
+    if session_factory is not None:
+        schedule_taste_profile_update(session_factory, user_id)
+    else:
+        await _refresh_taste_profile(session, user_id)
     return watched_id
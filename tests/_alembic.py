@@ -1,12 +1,22 @@
 from __future__ import annotations
 
-import os
-from alembic.config import Config
-from alembic import command
+from sqlalchemy import create_engine, pool
 
 
 def alembic_upgrade_head(database_url_sync: str) -> None:
+    # alembic импортируем здесь: прогону без БД (-m "not integration") он не нужен
+    from alembic import command
+    from alembic.config import Config
+
     cfg = Config("alembic.ini")
     # переопределяем URL именно для тестов
     cfg.set_main_option("sqlalchemy.url", database_url_sync)
-    command.upgrade(cfg, "head")
+
+    # Все миграции — на одном соединении и в одной транзакции (см. env.py: attributes["connection"])
+    engine = create_engine(database_url_sync, poolclass=pool.NullPool, future=True)
+    try:
+        with engine.begin() as conn:
+            cfg.attributes["connection"] = conn
+            command.upgrade(cfg, "head")
+    finally:
+        engine.dispose()
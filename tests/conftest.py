@@ -1,38 +1,42 @@
+import copy
+import importlib
 import os
 import pytest
 import pytest_asyncio
 
-from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.pool import NullPool
 
 from tests._alembic import alembic_upgrade_head
-from tests.fakes.tmdb_stub import DETAILS, KEYWORDS, RECOMMENDATIONS, SIMILAR
+from tests.fakes.tmdb_stub import DETAILS, KEYWORDS, RECOMMENDATIONS, SIMILAR, empty_keywords, empty_page
 
 import app.integrations.tmdb as tmdb  # важно: патчим модуль, а не "from ... import ..."
-from pathlib import Path
-
-def _load_env_file(path: str = ".env.test") -> None:
-    p = Path(path)
-    if not p.exists():
-        return
-    for raw in p.read_text().splitlines():
-        line = raw.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        k, v = line.split("=", 1)
-        k = k.strip()
-        v = v.strip().strip('"').strip("'")
-        os.environ.setdefault(k, v)
-
-_load_env_file(".env.test")
+from dotenv import dotenv_values
+
+# .env.test — одним разбором python-dotenv; уже выставленные переменные окружения важнее
+for _k, _v in dotenv_values(".env.test").items():
+    if _v is not None:
+        os.environ.setdefault(_k, _v)
+
+# снимок окружения: дальше все поиски по обычному dict
+_ENV = dict(os.environ)
+
 
 def _env_first(*keys: str) -> str | None:
-    for k in keys:
-        v = os.getenv(k)
-        if v:
-            return v
-    return None
+    return next((_ENV[k] for k in keys if _ENV.get(k)), None)
+
+
+# sync-драйвер -> asyncpg (по префиксу URL)
+_ASYNC_URL_PREFIXES = (
+    ("postgresql+psycopg://", "postgresql+asyncpg://"),
+    ("postgresql://", "postgresql+asyncpg://"),
+)
+
+
+def _to_async_url(url: str) -> str:
+    for old, new in _ASYNC_URL_PREFIXES:
+        if url.startswith(old):
+            return new + url[len(old):]
+    return url
 
 
 # Подхватываем URL'ы из .env.test (ты их export'ишь перед pytest)
@@ -46,23 +50,50 @@ if not TEST_DB_SYNC:
 
 # Если ASYNC не задан — аккуратно деривим из sync URL
 if not TEST_DB_ASYNC:
-    TEST_DB_ASYNC = (
-        TEST_DB_SYNC.replace("postgresql+psycopg://", "postgresql+asyncpg://")
-        .replace("postgresql://", "postgresql+asyncpg://")
-    )
+    TEST_DB_ASYNC = _to_async_url(TEST_DB_SYNC)
+
+
+# Тесты, которым нужна Postgres: всё, что (в т.ч. транзитивно) тянет эти фикстуры
+_DB_FIXTURES = frozenset({"async_engine", "session", "core_conn", "shared_conn", "shared_session"})
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    # маркер integration ставим сами (до фильтра -m), чтобы -m "not integration" не трогал БД
+    for item in items:
+        if _DB_FIXTURES.intersection(getattr(item, "fixturenames", ())):
+            item.add_marker(pytest.mark.integration)
+
+
+# Тяжёлые модули (declarative registry, рекомендатель, numpy) — один раз на процесс/воркер
+_PRELOAD_MODULES = (
+    "app.db.models",
+    "app.db.repositories.users",
+    "app.db.repositories.recommendations",
+    "app.recommender.v0",
+    "app.services.review_service",
+)
 
 
 @pytest.fixture(scope="session", autouse=True)
+def _preload_app_modules():
+    for name in _PRELOAD_MODULES:
+        importlib.import_module(name)
+
+
+@pytest.fixture(scope="session")
 def _migrate_test_db():
-    # накатываем миграции один раз на тестовую БД
+    # накатываем миграции один раз на тестовую БД — лениво, через async_engine:
+    # тестам без БД (-m "not integration") Postgres не нужен
     alembic_upgrade_head(TEST_DB_SYNC)
 
 
 @pytest_asyncio.fixture(scope="session")
-async def async_engine():
-    # NullPool = не переиспользуем asyncpg connections между тестами/лупами,
-    # это сильно снижает шанс "Future attached to a different loop"
-    engine = create_async_engine(TEST_DB_ASYNC, poolclass=NullPool, future=True)
+async def async_engine(_migrate_test_db):
+    # Небольшой пул: asyncpg connect + интроспекция типов один раз, а не на каждый тест.
+    # Тесты и фикстуры крутятся в одном session-loop (см. pytest.ini), так что
+    # соединения не переезжают между лупами; изоляция — через SAVEPOINT в session.
+    engine = create_async_engine(TEST_DB_ASYNC, pool_size=5, max_overflow=0, future=True)
     try:
         yield engine
     finally:
@@ -73,18 +104,12 @@ async def async_engine():
 async def session(async_engine):
     # 1) одна connection на тест
     # 2) outer transaction
-    # 3) nested transaction (SAVEPOINT) — чтобы session.commit() не "закрывал" outer
+    # 3) сессия работает в SAVEPOINT'ах (create_savepoint): session.commit() не "закрывает" outer,
+    #    новый savepoint SQLAlchemy поднимает сам
     async with async_engine.connect() as conn:
         await conn.begin()
-        await conn.begin_nested()
-
-        s = AsyncSession(bind=conn, expire_on_commit=False)
 
-        @event.listens_for(s.sync_session, "after_transaction_end")
-        def _restart_savepoint(sess, trans):
-            # после commit/rollback nested-транзакции поднимаем новый savepoint
-            if trans.nested and not trans._parent.nested:
-                conn.sync_connection.begin_nested()
+        s = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
 
         try:
             yield s
@@ -94,22 +119,67 @@ async def session(async_engine):
             await conn.rollback()
 
 
-@pytest.fixture(autouse=True)
-def _stub_tmdb(monkeypatch):
-    # Заглушаем TMDB, чтобы не было сети и 404
-    async def fake_get_movie_details_payload(session, tmdb_id: int):
-        return DETAILS[tmdb_id]
+@pytest_asyncio.fixture(scope="session")
+async def shared_conn(async_engine):
+    # одна connection + outer transaction на весь прогон — для тестов, которым нужна только
+    # read-only подготовка (рекомендатель): общие строки создаются один раз, в конце всё откатывается
+    async with async_engine.connect() as conn:
+        await conn.begin()
+        try:
+            yield conn
+        finally:
+            await conn.rollback()
+
+
+@pytest_asyncio.fixture()
+async def shared_session(shared_conn):
+    # SAVEPOINT на тест поверх shared_conn; незакоммиченное откатывается на teardown
+    s = AsyncSession(bind=shared_conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+    try:
+        yield s
+    finally:
+        await s.rollback()
+        await s.close()
+
+
+@pytest_asyncio.fixture()
+async def core_conn(session):
+    # то же соединение и та же транзакция, что у session: строки, вставленные через Core
+    # (без unit of work и identity map), сессия и код под тестом видят сразу
+    return await session.connection()
+
+
+# Заглушки TMDB, чтобы не было сети и 404 — определяются один раз на модуль.
+# Каждый вызов отдаёт свой payload (deepcopy): правка результата в одном тесте не протечёт в другой
+async def _fake_get_movie_details_payload(session, tmdb_id: int):
+    return copy.deepcopy(DETAILS[tmdb_id])
+
+
+async def _fake_get_movie_keywords_payload(session, tmdb_id: int):
+    kw = KEYWORDS.get(tmdb_id)
+    return copy.deepcopy(kw) if kw is not None else empty_keywords(tmdb_id)
 
-    async def fake_get_movie_keywords_payload(session, tmdb_id: int):
-        return KEYWORDS.get(tmdb_id, {"id": tmdb_id, "keywords": []})
 
-    async def fake_get_movie_similar_payload(session, tmdb_id: int):
-        return SIMILAR.get(tmdb_id, {"page": 1, "results": []})
+async def _fake_get_movie_similar_payload(session, tmdb_id: int):
+    page = SIMILAR.get(tmdb_id)
+    return copy.deepcopy(page) if page is not None else empty_page()
 
-    async def fake_get_movie_recommendations_payload(session, tmdb_id: int):
-        return RECOMMENDATIONS.get(tmdb_id, {"page": 1, "results": []})
 
-    monkeypatch.setattr(tmdb, "get_movie_details_payload", fake_get_movie_details_payload)
-    monkeypatch.setattr(tmdb, "get_movie_keywords_payload", fake_get_movie_keywords_payload)
-    monkeypatch.setattr(tmdb, "get_movie_similar_payload", fake_get_movie_similar_payload)
-    monkeypatch.setattr(tmdb, "get_movie_recommendations_payload", fake_get_movie_recommendations_payload)
+async def _fake_get_movie_recommendations_payload(session, tmdb_id: int):
+    page = RECOMMENDATIONS.get(tmdb_id)
+    return copy.deepcopy(page) if page is not None else empty_page()
+
+
+@pytest.fixture(scope="session")
+def monkeypatch_session():
+    with pytest.MonkeyPatch.context() as mp:
+        yield mp
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _stub_tmdb(monkeypatch_session):
+    # патчим один раз на весь прогон: заглушки между тестами не меняются
+    monkeypatch_session.setattr(tmdb, "get_movie_details_payload", _fake_get_movie_details_payload)
+    monkeypatch_session.setattr(tmdb, "get_movie_keywords_payload", _fake_get_movie_keywords_payload)
+    monkeypatch_session.setattr(tmdb, "get_movie_similar_payload", _fake_get_movie_similar_payload)
+    monkeypatch_session.setattr(tmdb, "get_movie_recommendations_payload", _fake_get_movie_recommendations_payload)
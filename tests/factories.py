@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User
+
+
+async def make_user(session: AsyncSession, telegram_id: int, **fields) -> User:
+    """
+    Пользователь для теста: INSERT одним flush (id из RETURNING), без SELECT и commit,
+    как в get_or_create_user — telegram_id в тестах уникальны, транзакция всё равно откатывается.
+    Серверные дефолты (timezone, created_at) после flush не загружены: нужные поля передавай явно.
+    """
+    user = User(telegram_id=telegram_id, **fields)
+    session.add(user)
+    await session.flush()
+    return user
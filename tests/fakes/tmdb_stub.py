@@ -1,6 +1,10 @@
 # tests/fakes/tmdb_stub.py
 
-DETAILS = {
+from types import MappingProxyType
+
+# Общие на весь прогон (заглушки патчатся один раз на сессию). MappingProxyType закрывает
+# только сами таблицы; вложенные payload'ы изменяемы, поэтому заглушки в conftest отдают их копии
+DETAILS = MappingProxyType({
     999: {
         "id": 999,
         "title": "Watched",
@@ -34,15 +38,15 @@ DETAILS = {
         "vote_average": 7.2,
         "vote_count": 400,
     },
-}
+})
 
-KEYWORDS = {
+KEYWORDS = MappingProxyType({
     999: {"id": 999, "keywords": [{"id": 1, "name": "corporate"}, {"id": 2, "name": "law"}]},
     1001: {"id": 1001, "keywords": [{"id": 10, "name": "family"}]},
     1002: {"id": 1002, "keywords": [{"id": 20, "name": "mystery"}]},
-}
+})
 
-SIMILAR = {
+SIMILAR = MappingProxyType({
     999: {
         "page": 1,
         "results": [
@@ -50,9 +54,9 @@ SIMILAR = {
             {"id": 1002, "title": "Candidate B", "release_date": "2002-01-01"},
         ],
     }
-}
+})
 
-RECOMMENDATIONS = {
+RECOMMENDATIONS = MappingProxyType({
     999: {
         "page": 1,
         "results": [
@@ -60,4 +64,13 @@ RECOMMENDATIONS = {
             {"id": 1002, "title": "Candidate B", "release_date": "2002-01-01"},
         ],
     }
-}
+})
+
+# Ответы по умолчанию для id без данных — в форме настоящего TMDB (списки: парсеры в tmdb.py
+# проверяют isinstance(..., list), кортежи там не пройдут), каждый раз новый dict
+def empty_keywords(tmdb_id: int) -> dict:
+    return {"id": tmdb_id, "keywords": []}
+
+
+def empty_page() -> dict:
+    return {"page": 1, "results": []}
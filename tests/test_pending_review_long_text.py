@@ -2,20 +2,19 @@ from __future__ import annotations
 
 import pytest
 
-from app.db.repositories.users import get_or_create_user
+from tests.factories import make_user
 from app.db.models import WatchedFilm
 from sqlalchemy import select
 
 from app.services.review_service import save_review
 
+_LONG_REVIEW = "очень_длинная_рецензия " * 2000  # ~40k символов, собирается один раз на модуль
+
 
 @pytest.mark.asyncio
 async def test_long_review_saved(session):
-    user = await get_or_create_user(session, telegram_id=3333)
-    user.timezone = "Europe/Stockholm"
-    await session.commit()
+    user = await make_user(session, telegram_id=3333, timezone="Europe/Stockholm")
 
-    long_text = "очень_длинная_рецензия " * 2000  # ~40k символов
     tmdb_id = 348  # любой id (для тестов лучше замокать TMDB, но минимум — так)
 
     # ВНИМАНИЕ:
@@ -27,10 +26,10 @@ async def test_long_review_saved(session):
         user_timezone=user.timezone,
         tmdb_id=tmdb_id,
         rating=4.0,
-        review_text=long_text,
+        review_text=_LONG_REVIEW,
         mode="manual",
     )
 
     row = (await session.execute(select(WatchedFilm).where(WatchedFilm.id == watched_id))).scalar_one()
     assert row.your_review is not None
-    assert len(row.your_review) == len(long_text)
+    assert len(row.your_review) == len(_LONG_REVIEW)
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.integrations.tmdb import MovieDetails
+from app.services import review_service
+from tests.factories import make_user
+
+
+@pytest.mark.asyncio
+async def test_back_to_back_saves_recompute_profile_once(session, monkeypatch):
+    user = await make_user(session, telegram_id=5555, timezone="Europe/Stockholm")
+
+    async def fake_details(session, tmdb_id: int) -> MovieDetails:
+        return MovieDetails(tmdb_id=tmdb_id, title=f"Film {tmdb_id}", year=2001, runtime=100, genres=[], overview=None)
+
+    recomputes: list[int] = []
+
+    async def fake_refresh(session, user_id: int) -> None:
+        recomputes.append(user_id)
+
+    monkeypatch.setattr(review_service, "get_movie_details_cached", fake_details)
+    monkeypatch.setattr(review_service, "_refresh_taste_profile", fake_refresh)
+    monkeypatch.setattr(review_service, "PROFILE_DEBOUNCE_SECONDS", 0.05)
+
+    # фоновая задача получает ту же тестовую сессию: сохранения к её запуску уже завершены
+    @asynccontextmanager
+    async def session_factory():
+        yield session
+
+    for tmdb_id in (1001, 1002):
+        await review_service.save_review(
+            session,
+            user_id=user.id,
+            user_timezone=user.timezone,
+            tmdb_id=tmdb_id,
+            rating=4.0,
+            review_text=None,
+            mode="manual",
+            session_factory=session_factory,
+        )
+
+    await review_service._profile_tasks[user.id]
+    assert recomputes == [user.id]
@@ -7,7 +7,7 @@ import asyncio
 import pytest
 from datetime import datetime, timezone
 
-from app.db.repositories.users import get_or_create_user
+from tests.factories import make_user
 from app.db.repositories.rate_limit import check_and_touch
 from app.db.models import CommandRateLimit
 from app.db.session import AsyncSessionLocal
@@ -19,8 +19,7 @@ async def test_rate_limit_allows_after_interval(session):
     """
     Test that rate limit allows requests after the interval has passed.
     """
-    user = await get_or_create_user(session, telegram_id=9998)
-    await session.commit()
+    user = await make_user(session, telegram_id=9998)
 
     # First call should succeed
     allowed1, retry1 = await check_and_touch(session, user.id, "recommend", 1)
@@ -46,8 +45,7 @@ async def test_rate_limit_per_command(session):
     """
     Test that rate limits are per-command, not per-user.
     """
-    user = await get_or_create_user(session, telegram_id=9997)
-    await session.commit()
+    user = await make_user(session, telegram_id=9997)
 
     # Different commands should not interfere with each other
     allowed1, _ = await check_and_touch(session, user.id, "recommend", 60)
@@ -67,9 +65,8 @@ async def test_rate_limit_per_user(session):
     """
     Test that rate limits are per-user.
     """
-    user1 = await get_or_create_user(session, telegram_id=9996)
-    user2 = await get_or_create_user(session, telegram_id=9995)
-    await session.commit()
+    user1 = await make_user(session, telegram_id=9996)
+    user2 = await make_user(session, telegram_id=9995)
 
     # Different users should not interfere with each other
     allowed1, _ = await check_and_touch(session, user1.id, "recommend", 60)
@@ -85,8 +82,7 @@ async def test_rate_limit_handles_rapid_successive_calls(session):
     Test that multiple rapid calls are correctly rate limited.
     The first succeeds, subsequent calls are rejected.
     """
-    user = await get_or_create_user(session, telegram_id=9993)
-    await session.commit()
+    user = await make_user(session, telegram_id=9993)
 
     # First call should succeed
     allowed1, _ = await check_and_touch(session, user.id, "test_rapid", 60)
@@ -6,18 +6,27 @@ from __future__ import annotations
 import pytest
 from sqlalchemy import select, func
 
-from app.db.repositories.users import get_or_create_user
+from tests.factories import make_user
 from app.db.repositories.recommendations import create_recommendation, add_recommendation_item
 from app.db.models import AgentRecommendationItem
 
 
 @pytest.mark.asyncio
-async def test_different_positions_allowed(session):
+@pytest.mark.parametrize(
+    "telegram_id,items",
+    [
+        # different positions, same tmdb_id
+        (8887, [(550, 1, "safe", "Item 1"), (550, 2, "safe", "Item 2"), (550, 3, "safe", "Item 3")]),
+        # different tmdb_ids, same position
+        (8886, [(550, 1, "safe", "Movie 1"), (680, 1, "adjacent", "Movie 2"), (13, 1, "wildcard", "Movie 3")]),
+    ],
+    ids=["different_positions", "different_tmdb_ids"],
+)
+async def test_distinct_items_allowed(session, telegram_id, items):
     """
-    Test that items with different positions can be added to the same recommendation.
+    Test that items differing in position or tmdb_id can all be added to the same recommendation.
     """
-    user = await get_or_create_user(session, telegram_id=8887)
-    await session.commit()
+    user = await make_user(session, telegram_id=telegram_id)
 
     rec = await create_recommendation(
         session,
@@ -25,55 +34,17 @@ async def test_different_positions_allowed(session):
         context={"mode": "test"},
     )
 
-    # Add items with different positions
-    item1 = await add_recommendation_item(session, rec.id, 550, 1, "safe", "Item 1")
-    item2 = await add_recommendation_item(session, rec.id, 550, 2, "safe", "Item 2")
-    item3 = await add_recommendation_item(session, rec.id, 550, 3, "safe", "Item 3")
-    
-    results = [item1, item2, item3]
-    assert len(results) == 3
+    results = [await add_recommendation_item(session, rec.id, *item) for item in items]
+    assert len({r.id for r in results}) == len(items)
 
-    # All three should exist
+    # All of them should exist
     count = (await session.execute(
         select(func.count()).select_from(AgentRecommendationItem).where(
             AgentRecommendationItem.recommendation_id == rec.id,
-            AgentRecommendationItem.tmdb_id == 550,
         )
     )).scalar_one()
 
-    assert count == 3, f"Expected 3 items in database, got {count}"
-
-
-@pytest.mark.asyncio
-async def test_different_tmdb_ids_allowed(session):
-    """
-    Test that items with different tmdb_ids can be added to the same recommendation.
-    """
-    user = await get_or_create_user(session, telegram_id=8886)
-    await session.commit()
-
-    rec = await create_recommendation(
-        session,
-        user.id,
-        context={"mode": "test"},
-    )
-
-    # Add items with different tmdb_ids
-    item1 = await add_recommendation_item(session, rec.id, 550, 1, "safe", "Movie 1")
-    item2 = await add_recommendation_item(session, rec.id, 680, 1, "adjacent", "Movie 2")
-    item3 = await add_recommendation_item(session, rec.id, 13, 1, "wildcard", "Movie 3")
-    
-    results = [item1, item2, item3]
-    assert len(results) == 3
-
-    # All three should exist
-    count = (await session.execute(
-        select(func.count()).select_from(AgentRecommendationItem).where(
-            AgentRecommendationItem.recommendation_id == rec.id,
-        )
-    )).scalar_one()
-
-    assert count == 3, f"Expected 3 items in database, got {count}"
+    assert count == len(items), f"Expected {len(items)} items in database, got {count}"
 
 
 @pytest.mark.asyncio
@@ -82,8 +53,7 @@ async def test_sequential_same_item_returns_same_record(session):
     Test that adding the same item multiple times returns the same record.
     This validates the upsert logic that prevents duplicates.
     """
-    user = await get_or_create_user(session, telegram_id=8885)
-    await session.commit()
+    user = await make_user(session, telegram_id=8885)
 
     rec = await create_recommendation(
         session,
@@ -1,19 +1,36 @@
 from __future__ import annotations
 
 import pytest
+import pytest_asyncio
+from sqlalchemy import insert
 
 from app.db.models import User, WatchedFilm
-from app.db.repositories.users import get_or_create_user
-from app.recommender.v0 import recommend_v0
+from app.integrations.tmdb import MovieCandidate
+from app.recommender.v0 import _filter_candidates, recommend_v0
 
 
-@pytest.mark.asyncio
-async def test_do_not_recommend_watched(session):
-    user = await get_or_create_user(session, telegram_id=1111)
+@pytest_asyncio.fixture(scope="module")
+async def seeded_user(shared_conn) -> int:
+    # создаётся один раз на модуль в общей транзакции прогона
+    return (await shared_conn.execute(insert(User).values(telegram_id=1111).returning(User.id))).scalar_one()
+
+
+@pytest_asyncio.fixture()
+async def session(shared_session):
+    # переопределяет conftest.session: тест работает в SAVEPOINT поверх shared_conn
+    return shared_session
+
 
-    # добавим просмотренный фильм
-    wf = WatchedFilm(
-        user_id=user.id,
+def test_filter_excludes_watched_ids():
+    by_id = {999: MovieCandidate(999, "Watched", 2000), 7: MovieCandidate(7, "Fresh", 2001)}
+    assert [c.tmdb_id for c in _filter_candidates(by_id, {999}, set(), set())] == [7]
+
+
+@pytest.mark.asyncio
+async def test_do_not_recommend_watched(session, core_conn, seeded_user):
+    # добавим просмотренный фильм (Core INSERT — ORM-объект тесту не нужен)
+    await core_conn.execute(insert(WatchedFilm).values(
+        user_id=seeded_user,
         tmdb_id=999,
         title="Watched",
         year=2000,
@@ -21,11 +38,9 @@ async def test_do_not_recommend_watched(session):
         your_review=None,
         watched_date=None,
         source="letterboxd",
-    )
-    session.add(wf)
-    await session.commit()
+    ))
 
-    picks = await recommend_v0(session=session, user_id=user.id, count=3, recent_days=60, seeds_limit=20)
+    picks = await recommend_v0(session=session, user_id=seeded_user, count=3, recent_days=60, seeds_limit=20)
 
     # ключевой инвариант: tmdb_id=999 не должен появиться
     assert all(p.tmdb_id != 999 for p in picks)